@@ -0,0 +1,160 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from json import dumps, load
+from os.path import basename, exists, splitext
+from time import time
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+
+
+def readMetaLines(metaFile):
+	# lines of a .ts.meta file: service reference, title, description, recording time, tags, length (pts), file size, ...
+	try:
+		with open(metaFile, "rb") as f:
+			return f.read().decode("utf-8", "replace").split("\n")
+	except OSError:
+		return []
+
+
+class ArchiveCatalog(object):
+	# archived recordings: target path of the movie -> [title, description, service, begin, duration, size, archived].
+	# Taken from the .meta and .eit files of the source at transfer time, so the archive can be listed and searched
+	# without waking the archive disk. The disk is only touched when a recording is played or restored
+	ENTRY_TITLE = 0
+	ENTRY_DESCRIPTION = 1
+	ENTRY_SERVICE = 2
+	ENTRY_BEGIN = 3  # unix time of the recording
+	ENTRY_DURATION = 4  # seconds, 0 if unknown
+	ENTRY_SIZE = 5  # bytes of the whole bundle
+	ENTRY_ARCHIVED = 6  # unix time of the transfer
+	META_SERVICE = 0  # lines of a .ts.meta file
+	META_TITLE = 1
+	META_DESCRIPTION = 2
+	META_BEGIN = 3
+	META_LENGTH = 5  # pts (90 kHz)
+	EIT_SHORT_EVENT = 0x4D
+
+	def __init__(self, catalogFile=None):
+		self.catalogFile = catalogFile or getDataFile("archive_catalog.json")
+		self.entries = {}
+		self.dirty = False
+		self.load()
+
+	def load(self):
+		if exists(self.catalogFile):
+			try:
+				with open(self.catalogFile, "r") as f:
+					self.entries = load(f)
+			except Exception as e:
+				printToConsole("[ArchiveCatalog] can't load '%s': %s" % (self.catalogFile, str(e)))
+				self.entries = {}
+
+	def save(self):
+		if self.dirty and saveDataFile(self.catalogFile, dumps(self.entries, separators=(",", ":"))):
+			self.dirty = False
+
+	def add(self, moviePath, info):
+		# info from getRecordingInfo, service is the resolved service name
+		self.entries[moviePath] = [info["title"], info["description"], info["service"], info["begin"], info["duration"], info["size"], int(time())]
+		self.dirty = True
+
+	def remove(self, moviePath):
+		if self.entries.pop(moviePath, None) is not None:
+			self.dirty = True
+
+	def get(self, moviePath):
+		return self.entries.get(moviePath)
+
+	def getEntries(self, searchText=None):
+		# (moviePath, entry) newest recording first, searchText is matched against title and description
+		if searchText:
+			searchText = searchText.lower()
+			entries = [(moviePath, entry) for moviePath, entry in self.entries.items() if searchText in entry[self.ENTRY_TITLE].lower() or searchText in entry[self.ENTRY_DESCRIPTION].lower()]
+		else:
+			entries = list(self.entries.items())
+		return sorted(entries, key=lambda item: item[1][self.ENTRY_BEGIN], reverse=True)
+
+	def getRecordingInfo(self, sourceFiles):
+		# title, description, service reference, begin, duration and size of a recording bundle, read from the
+		# source files before they are moved. sourceFiles[0] is the movie
+		moviePath = sourceFiles[0]
+		info = {"title": splitext(basename(moviePath))[0], "description": "", "serviceRef": "", "begin": 0, "duration": 0, "size": 0}
+		metaFile = moviePath + ".meta"
+		eitFile = splitext(moviePath)[0] + ".eit"
+		if metaFile in sourceFiles:
+			self.__readMeta(metaFile, info)
+		if eitFile in sourceFiles:
+			self.__readEit(eitFile, info)
+		return info
+
+	def __readMeta(self, metaFile, info):  # Private Methods
+		lines = readMetaLines(metaFile)
+		field = lambda index: lines[index].strip() if len(lines) > index else ""
+		info["serviceRef"] = field(self.META_SERVICE)
+		info["title"] = field(self.META_TITLE) or info["title"]
+		info["description"] = field(self.META_DESCRIPTION)
+		if field(self.META_BEGIN).isdigit():
+			info["begin"] = int(field(self.META_BEGIN))
+		if field(self.META_LENGTH).isdigit():
+			info["duration"] = int(field(self.META_LENGTH)) // 90000
+
+	def __readEit(self, eitFile, info):
+		# event part of a DVB EIT: event_id(2) start_time(5) duration(3) flags/descriptors_loop_length(2) descriptors
+		try:
+			with open(eitFile, "rb") as f:
+				data = f.read()
+		except OSError:
+			return
+		if len(data) < 12:
+			return
+		bcd = lambda value: (value >> 4) * 10 + (value & 0x0F)
+		if not info["begin"]:  # start_time is the modified julian date and the utc time in bcd
+			info["begin"] = ((data[2] << 8 | data[3]) - 40587) * 86400 + bcd(data[4]) * 3600 + bcd(data[5]) * 60 + bcd(data[6])
+		if not info["duration"]:
+			info["duration"] = bcd(data[7]) * 3600 + bcd(data[8]) * 60 + bcd(data[9])
+		pos = 12
+		end = min(len(data), pos + (((data[10] & 0x0F) << 8) | data[11]))
+		while pos + 2 <= end:
+			tag, length = data[pos], data[pos + 1]
+			if tag == self.EIT_SHORT_EVENT and pos + 6 <= end:
+				nameLength = data[pos + 5]
+				title = self.__decodeText(data[pos + 6:pos + 6 + nameLength])
+				textStart = pos + 6 + nameLength
+				description = self.__decodeText(data[textStart + 1:textStart + 1 + data[textStart]]) if textStart < end else ""
+				if not info["title"] or info["title"] == splitext(basename(eitFile))[0]:  # the .meta wins
+					info["title"] = title or info["title"]
+				if not info["description"]:
+					info["description"] = description
+				break
+			pos += 2 + length
+
+	def __decodeText(self, data):
+		# DVB strings start with a character table byte if they are not latin
+		if data and data[0] == 0x15:
+			return data[1:].decode("utf-8", "replace").strip()
+		if data and data[0] < 0x20:
+			data = data[1:]
+		return data.decode("latin-1").strip()
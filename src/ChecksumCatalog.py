@@ -0,0 +1,88 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from json import dumps, load
+from os import stat
+from os.path import exists
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+
+
+class ChecksumCatalog(object):
+	# checksums of verified transfers: path -> [size, mtime_ns, md5]. An entry is only valid as long as
+	# size and mtime of the file are unchanged, so backup comparisons can reuse it without reading the file
+	ENTRY_SIZE = 0
+	ENTRY_MTIME = 1
+	ENTRY_CHECKSUM = 2
+
+	def __init__(self, catalogFile=None):
+		self.catalogFile = catalogFile or getDataFile("checksums.json")
+		self.entries = {}
+		self.dirty = False
+		self.load()
+
+	def load(self):
+		if exists(self.catalogFile):
+			try:
+				with open(self.catalogFile, "r") as f:
+					self.entries = load(f)
+			except Exception as e:
+				printToConsole("[ChecksumCatalog] can't load '%s': %s" % (self.catalogFile, str(e)))
+				self.entries = {}
+
+	def save(self):
+		if self.dirty and saveDataFile(self.catalogFile, dumps(dict(self.entries), separators=(",", ":"))):  # copy, the Deduplicator adds checksums from worker threads
+			self.dirty = False
+
+	def add(self, fileName, checksum, size=None, mtime=None):
+		if size is None or mtime is None:
+			try:
+				st = stat(fileName)
+			except OSError:
+				return
+			size, mtime = st.st_size, st.st_mtime_ns
+		self.entries[fileName] = [size, mtime, checksum]
+		self.dirty = True
+
+	def remove(self, fileName):
+		if self.entries.pop(fileName, None) is not None:
+			self.dirty = True
+
+	def get(self, fileName, size, mtime):
+		# returns the checksum if the file wasnt changed since it was recorded, otherwise None
+		entry = self.entries.get(fileName)
+		if entry is not None and entry[self.ENTRY_SIZE] == size and entry[self.ENTRY_MTIME] == mtime:
+			return entry[self.ENTRY_CHECKSUM]
+		return None
+
+	def isDifferent(self, sourceFile, sourceSize, sourceMtime, targetFile, targetSize, targetMtime):
+		# True or False if it can be decided from size and recorded checksums, None if the files must be compared otherwise
+		if sourceSize != targetSize:
+			return True
+		sourceChecksum = self.get(sourceFile, sourceSize, sourceMtime)
+		targetChecksum = self.get(targetFile, targetSize, targetMtime)
+		if sourceChecksum is None or targetChecksum is None:
+			return None
+		return sourceChecksum != targetChecksum
@@ -0,0 +1,134 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from os import stat
+from os.path import normpath
+from struct import iter_unpack
+from time import time
+
+# PLUGIN IMPORTS
+from .ArchiveCatalog import ArchiveCatalog, readMetaLines
+
+DAY = 86400.0
+GB = 1024 * 1024 * 1024
+PTS_PER_SECOND = 90000
+
+
+class MovieHistory(object):
+	# what the rules know about a movie: recording time and length from the .ts.meta, last play position and time from the .ts.cuts
+	__slots__ = ("record", "begin", "length", "lastPosition", "lastPlayed")
+	CUT_TYPE_LAST = 3  # .cuts entries are (pts, type), type 3 is the last play position
+
+	def __init__(self, record):
+		self.record = record  # FileRecord of the movie
+		self.begin = record.mtime / 1e9  # unix time, the .meta wins
+		self.length = 0  # seconds, 0 if unknown
+		self.lastPosition = None  # seconds, None if never played
+		self.lastPlayed = None  # unix time of the last play (mtime of the .cuts)
+		self.__readMeta()
+		self.__readCuts()
+
+	def isWatched(self, ratio):
+		return self.lastPosition is not None and self.length > 0 and self.lastPosition >= self.length * ratio
+
+	def isStarted(self):
+		return self.lastPosition is not None and self.lastPosition > 0
+
+	def __readMeta(self):  # Private Methods
+		lines = readMetaLines(self.record.path + ".meta")
+		field = lambda index: lines[index].strip() if len(lines) > index else ""
+		if field(ArchiveCatalog.META_BEGIN).isdigit():
+			self.begin = int(field(ArchiveCatalog.META_BEGIN))
+		if field(ArchiveCatalog.META_LENGTH).isdigit():
+			self.length = int(field(ArchiveCatalog.META_LENGTH)) // PTS_PER_SECOND
+
+	def __readCuts(self):
+		cutsFile = self.record.path + ".cuts"
+		try:
+			with open(cutsFile, "rb") as f:
+				data = f.read()
+			mtime = stat(cutsFile).st_mtime
+		except OSError:
+			return
+		for pts, cutType in iter_unpack(">QI", data[:len(data) - len(data) % 12]):
+			if cutType == self.CUT_TYPE_LAST:
+				self.lastPosition = pts // PTS_PER_SECOND
+				self.lastPlayed = mtime
+
+
+class IdleRule(object):
+	# days since the movie was recorded or played the last time
+	def __call__(self, history, now):
+		return (now - max(history.begin, history.lastPlayed or 0)) / DAY
+
+
+class PlayStateRule(object):
+	# watched movies are colder, movies which are watched right now are hot
+	def __init__(self, watchedDays=30, startedDays=-30, watchedRatio=0.9):
+		self.watchedDays = watchedDays
+		self.startedDays = startedDays
+		self.watchedRatio = watchedRatio
+
+	def __call__(self, history, now):
+		if history.isWatched(self.watchedRatio):
+			return self.watchedDays
+		return self.startedDays if history.isStarted() else 0
+
+
+class SizeRule(object):
+	# big movies free more space with one transfer
+	def __init__(self, daysPerGB=1):
+		self.daysPerGB = daysPerGB
+
+	def __call__(self, history, now):
+		return history.record.size / GB * self.daysPerGB
+
+
+class FolderRule(object):
+	# fixed days for the movies in the given folders and their sub folders, negative days keep them local
+	def __init__(self, folders, days):
+		self.folders = tuple(normpath(folder) + "/" for folder in folders)
+		self.days = days
+
+	def __call__(self, history, now):
+		return self.days if self.folders and history.record.path.startswith(self.folders) else 0
+
+
+class ColdnessScorer(object):
+	# coldness of a movie in days, the sum of all rules. Higher is colder and is archived first. A rule is a
+	# callable(history, now) returning days, so new policies are added with addRule without touching the planner
+	KEEP_LOCAL_DAYS = -3650
+
+	def __init__(self, rules=None, keepLocalDirs=None):
+		self.rules = list(rules) if rules is not None else [IdleRule(), PlayStateRule(), SizeRule()]
+		if keepLocalDirs:
+			self.addRule(FolderRule(keepLocalDirs, self.KEEP_LOCAL_DAYS))
+		self.now = time()  # one reference time for a whole scan
+
+	def addRule(self, rule):
+		self.rules.append(rule)
+
+	def getScore(self, record):
+		history = MovieHistory(record)
+		return sum(rule(history, self.now) for rule in self.rules)
@@ -0,0 +1,177 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from hashlib import md5
+from os import close, link, open as osopen, read, rename, stat, unlink, O_RDONLY
+from os.path import exists, relpath
+
+# PLUGIN IMPORTS
+from . import printToConsole
+from .FileIndex import FileIndex
+from .FileTransfer import IoPriority
+from .Fingerprint import FingerprintCache
+
+
+class Deduplicator(object):
+	# finds files with the same content on an archive disk: same size, then the cached fingerprint, then the full md5
+	# (taken from the ChecksumCatalog if the file was verified). Duplicates are replaced by hardlinks and a new
+	# transfer whose content is already on the disk becomes a hardlink instead of a copy
+	MIN_SIZE = 64 * 1024 * 1024  # meta files and small clips are not worth the hashing
+	CHUNK_SIZE = 8 * 1024 * 1024
+	LINK_EXTENSION = ".dedupe"
+
+	def __init__(self, checksumCatalog, bandwidth=None):
+		self.checksumCatalog = checksumCatalog
+		self.bandwidth = bandwidth  # TokenBucket of the transfers
+		self.sizeMaps = {}  # root path -> {size: [paths]} of the files of a FileIndex
+
+	def getSizeMap(self, fileIndex):
+		# built once from the index, then kept up to date with addFile. Not while the index is refreshed
+		if fileIndex.rootPath not in self.sizeMaps:
+			sizeMap = {}
+			for relPath, fileEntry in fileIndex.iterFiles():
+				if fileEntry[FileIndex.FILE_SIZE] >= self.MIN_SIZE:
+					sizeMap.setdefault(fileEntry[FileIndex.FILE_SIZE], []).append(fileIndex.getAbsPath(relPath))
+			self.sizeMaps[fileIndex.rootPath] = sizeMap
+		return self.sizeMaps[fileIndex.rootPath]
+
+	def addFile(self, rootPath, fileName, size):
+		sizeMap = self.sizeMaps.get(rootPath)
+		if sizeMap is not None and size >= self.MIN_SIZE and fileName not in sizeMap.get(size, ()):
+			sizeMap.setdefault(size, []).append(fileName)
+
+	def invalidate(self, rootPath):
+		self.sizeMaps.pop(rootPath, None)
+
+	def findDuplicate(self, sourceFile, sizeMap):
+		# (file on the archive disk with the same content, md5) or None. Runs in the transfer thread
+		st = stat(sourceFile)
+		candidates = list(sizeMap.get(st.st_size, ())) if st.st_size >= self.MIN_SIZE else []
+		if not candidates:
+			return None
+		fingerprint = FingerprintCache.getInstance().getFingerprint(sourceFile)
+		checksum = None
+		for candidate in candidates:
+			try:
+				if FingerprintCache.getInstance().getFingerprint(candidate) != fingerprint:
+					continue
+				checksum = checksum or self.getChecksum(sourceFile, st)
+				if self.getChecksum(candidate) == checksum:
+					return (candidate, checksum)
+			except OSError:  # removed meanwhile
+				continue
+		return None
+
+	def dedupe(self, fileIndex):
+		# replaces duplicates in the tree of a freshly refreshed index by hardlinks, returns the freed bytes
+		self.invalidate(fileIndex.rootPath)
+		oldPriority = IoPriority.get()
+		IoPriority.setIdle()  # like the transfers, records and playback win
+		try:
+			freed = 0
+			for size, paths in list(self.getSizeMap(fileIndex).items()):
+				if len(paths) > 1:
+					freed += self.__dedupeFiles(fileIndex, size, paths)
+			return freed
+		finally:
+			IoPriority.set(oldPriority)
+
+	def linkFile(self, existingFile, fileName):
+		# fileName becomes a hardlink of existingFile. Atomic, fileName is never missing
+		tmpFile = fileName + self.LINK_EXTENSION
+		if exists(tmpFile):
+			unlink(tmpFile)
+		link(existingFile, tmpFile)
+		rename(tmpFile, fileName)
+
+	def getFingerprint(self, fileIndex, fileName):
+		# stored in the index entry like the fingerprints of the backup comparison
+		relPath = relpath(fileName, fileIndex.rootPath)
+		fingerprint = fileIndex.getFingerprint(relPath)
+		if fingerprint is None:
+			fingerprint = FingerprintCache.getInstance().getFingerprint(fileName, cache=False)
+			fileIndex.setFingerprint(relPath, fingerprint)
+		return fingerprint
+
+	def getChecksum(self, fileName, st=None):
+		st = st or stat(fileName)
+		checksum = self.checksumCatalog.get(fileName, st.st_size, st.st_mtime_ns)
+		if checksum is None:
+			checksum = self.__hashFile(fileName)
+			self.checksumCatalog.add(fileName, checksum, st.st_size, st.st_mtime_ns)
+		return checksum
+
+	def __dedupeFiles(self, fileIndex, size, paths):  # Private Methods
+		inodes = {}  # files which are linked already are one file
+		for path in sorted(paths):
+			try:
+				st = stat(path)
+			except OSError:
+				continue
+			inodes.setdefault((st.st_dev, st.st_ino), (path, st))
+		fingerprintGroups = {}  # only files with the same fingerprint are read completely
+		for path, st in inodes.values():
+			try:
+				fingerprintGroups.setdefault((st.st_dev, self.getFingerprint(fileIndex, path)), []).append((path, st))
+			except OSError:
+				continue
+		freed = 0
+		for files in fingerprintGroups.values():
+			if len(files) < 2:
+				continue
+			groups = {}
+			for path, st in files:
+				try:
+					groups.setdefault(self.getChecksum(path, st), []).append((path, st))
+				except OSError:
+					continue
+			for checksum, sameFiles in groups.items():
+				keepFile = sameFiles[0][0]
+				for duplicateFile, st in sameFiles[1:]:
+					try:
+						self.linkFile(keepFile, duplicateFile)
+					except OSError as e:
+						printToConsole("[Deduplicator] can't link '%s': %s" % (duplicateFile, str(e)))
+						continue
+					printToConsole("[Deduplicator] '%s' is a hardlink of '%s' now" % (duplicateFile, keepFile))
+					if st.st_nlink == 1:  # the last name of the old inode, its blocks are free now
+						freed += size
+					fileIndex.updateFile(relpath(duplicateFile, fileIndex.rootPath), fileIndex.getFingerprint(relpath(keepFile, fileIndex.rootPath)))
+					self.checksumCatalog.add(duplicateFile, checksum)  # the link has the mtime of keepFile
+		return freed
+
+	def __hashFile(self, fileName):
+		checksum = md5()
+		fd = osopen(fileName, O_RDONLY)
+		try:
+			while True:
+				data = read(fd, self.CHUNK_SIZE)
+				if not data:
+					break
+				checksum.update(data)
+				if self.bandwidth is not None:  # shares the limit of the transfers
+					self.bandwidth.consume(len(data))
+		finally:
+			close(fd)
+		return checksum.hexdigest()
@@ -0,0 +1,236 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+# PYTHON IMPORTS
+from hashlib import md5
+from json import dumps, load
+from os import scandir, stat
+from os.path import basename, dirname, exists, join, normpath
+from time import time
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+from .FileScanner import FileRecord
+
+
+class ExcludeFilter(object):
+	# exclusions compiled once into sets. Walks prune excluded directories, so their subtrees are never listed
+	def __init__(self, excludedDirNames=None, excludeDirs=None):
+		self.dirNames = frozenset(excludedDirNames or ())
+		self.dirs = frozenset(normpath(excludeDir) for excludeDir in excludeDirs or ())
+
+	def isExcluded(self, dirPath):
+		return basename(dirPath) in self.dirNames or normpath(dirPath) in self.dirs
+
+	def isExcludedTree(self, dirPath):
+		# dirPath or one of its parents is excluded. Only needed for the start folder of a walk
+		dirPath = normpath(dirPath)
+		while True:
+			if self.isExcluded(dirPath):
+				return True
+			parentPath = dirname(dirPath)
+			if parentPath == dirPath:
+				return False
+			dirPath = parentPath
+
+	def pruneDirNames(self, dirPath, dirNames):
+		dirNames[:] = [dirName for dirName in dirNames if dirName not in self.dirNames and normpath(join(dirPath, dirName)) not in self.dirs]
+
+
+class FileIndex(object):
+	# persistent index of a directory tree. Every directory entry stores its own mtime, the files
+	# (name -> [size, mtime_ns, inode(, fingerprint)]) and the names of its sub directories, so a refresh only needs
+	# to list directories whose mtime changed since the last run. The fingerprint is kept as long as the file is unchanged
+	VERSION = 1
+	DIR_MTIME = 0
+	DIR_FILES = 1
+	DIR_SUBDIRS = 2
+	FILE_SIZE = 0
+	FILE_MTIME = 1
+	FILE_INODE = 2
+	FILE_FINGERPRINT = 3  # optional, set by setFingerprint
+
+	def __init__(self, rootPath):
+		self.rootPath = rootPath.rstrip("/") or "/"
+		self.indexFile = getDataFile("index_%s.json" % md5(self.rootPath.encode("utf-8")).hexdigest())
+		self.dirs = {}  # relative dir path ("" is the root) -> [mtime_ns, {fileName: [size, mtime_ns, inode(, fingerprint)]}, [subDirNames]]
+		self.lastRefresh = 0
+		self.device = None
+		self.dirty = False
+		self.load()
+
+	def load(self):
+		if exists(self.indexFile):
+			try:
+				with open(self.indexFile, "r") as f:
+					data = load(f)
+				if data.get("version") == self.VERSION and data.get("root") == self.rootPath:
+					self.dirs = data.get("dirs", {})
+					self.lastRefresh = data.get("lastRefresh", 0)
+			except Exception as e:  # broken index, it will be rebuild on next refresh
+				printToConsole("[FileIndex] can't load index '%s': %s" % (self.indexFile, str(e)))
+				self.dirs = {}
+				self.lastRefresh = 0
+
+	def save(self):
+		if self.dirty and saveDataFile(self.indexFile, dumps({"version": self.VERSION, "root": self.rootPath, "lastRefresh": self.lastRefresh, "dirs": self.dirs}, separators=(",", ":"))):
+			self.dirty = False
+
+	def isValid(self, maxAge=None):
+		if not self.dirs:
+			return False
+		return maxAge is None or (time() - self.lastRefresh) < maxAge
+
+	def refresh(self, excludeFilter=None, statFiles=True):
+		# statFiles: re-stat the files of unchanged directories. Files which are changed in place (growing
+		# recordings, rewritten .cuts) dont change the mtime of their directory
+		seen = set()
+		stack = [""] if excludeFilter is None or not excludeFilter.isExcludedTree(self.rootPath) else []
+		while stack:
+			relDir = stack.pop()
+			absDir = self.getAbsPath(relDir)
+			try:
+				dirMtime = stat(absDir).st_mtime_ns
+			except OSError:
+				continue
+			seen.add(relDir)
+			cached = self.dirs.get(relDir)
+			if cached is None or cached[self.DIR_MTIME] != dirMtime:
+				cached = self.__listDir(absDir, dirMtime, cached)
+				self.dirs[relDir] = cached
+				self.dirty = True
+			elif statFiles:
+				self.__statFiles(absDir, cached)
+			subDirs = list(cached[self.DIR_SUBDIRS])
+			if excludeFilter is not None:
+				excludeFilter.pruneDirNames(absDir, subDirs)
+			stack.extend(join(relDir, subDir) for subDir in subDirs)
+		for relDir in [relDir for relDir in self.dirs if relDir not in seen]:  # removed or excluded dirs
+			del self.dirs[relDir]
+			self.dirty = True
+		self.lastRefresh = time()
+
+	def updateFile(self, relPath, fingerprint=None):
+		# update a single entry after the plugin has written the file, so the index stays valid without a rescan
+		absPath = self.getAbsPath(relPath)
+		relDir = dirname(relPath)
+		self.__updateDirChain(relDir)
+		files = self.dirs[relDir][self.DIR_FILES]
+		try:
+			st = stat(absPath)
+			files[basename(relPath)] = [st.st_size, st.st_mtime_ns, st.st_ino] + ([fingerprint] if fingerprint is not None else [])
+		except OSError:
+			files.pop(basename(relPath), None)
+		self.dirty = True
+
+	def getEntry(self, relPath):
+		entry = self.dirs.get(dirname(relPath))
+		return entry[self.DIR_FILES].get(basename(relPath)) if entry is not None else None
+
+	def getFingerprint(self, relPath):
+		fileEntry = self.getEntry(relPath)
+		return fileEntry[self.FILE_FINGERPRINT] if fileEntry is not None and len(fileEntry) > self.FILE_FINGERPRINT else None
+
+	def setFingerprint(self, relPath, fingerprint):
+		fileEntry = self.getEntry(relPath)
+		if fileEntry is not None and self.getFingerprint(relPath) != fingerprint:
+			fileEntry[self.FILE_FINGERPRINT:] = [fingerprint]
+			self.dirty = True
+
+	def iterFiles(self):
+		for relDir, entry in self.dirs.items():
+			for fileName, fileEntry in entry[self.DIR_FILES].items():
+				yield join(relDir, fileName), fileEntry
+
+	def getDirRecords(self, relDir):
+		# FileRecords of the files of one directory sorted by name, like a listing of the directory
+		entry = self.dirs.get(relDir)
+		if entry is None:
+			return []
+		absDir = self.getAbsPath(relDir)
+		device = self.getDevice()
+		return [FileRecord(join(absDir, fileName), fileEntry[self.FILE_SIZE], fileEntry[self.FILE_MTIME], fileEntry[self.FILE_INODE], device) for fileName, fileEntry in sorted(entry[self.DIR_FILES].items())]
+
+	def getDevice(self):
+		if self.device is None:
+			self.device = stat(self.rootPath).st_dev
+		return self.device
+
+	def getAbsPath(self, relPath):
+		return join(self.rootPath, relPath) if relPath else self.rootPath
+
+	def __listDir(self, absDir, dirMtime, cached=None):  # Private Methods
+		# fingerprints of the files which are unchanged since the last listing are kept
+		oldFiles = cached[self.DIR_FILES] if cached is not None else {}
+		files = {}
+		subDirs = []
+		try:
+			with scandir(absDir) as it:
+				for dirEntry in it:
+					try:
+						if dirEntry.is_dir(follow_symlinks=False):
+							subDirs.append(dirEntry.name)
+						elif dirEntry.is_file():
+							st = dirEntry.stat()
+							fileEntry = [st.st_size, st.st_mtime_ns, st.st_ino]
+							oldEntry = oldFiles.get(dirEntry.name)
+							if oldEntry is not None and oldEntry[:self.FILE_FINGERPRINT] == fileEntry:
+								fileEntry = oldEntry
+							files[dirEntry.name] = fileEntry
+					except OSError:  # file removed while listing
+						continue
+		except OSError as e:
+			printToConsole("[FileIndex] can't list '%s': %s" % (absDir, str(e)))
+		return [dirMtime, files, subDirs]
+
+	def __statFiles(self, absDir, cached):
+		files = cached[self.DIR_FILES]
+		for fileName, fileEntry in list(files.items()):
+			try:
+				st = stat(join(absDir, fileName))
+			except OSError:
+				del files[fileName]
+				self.dirty = True
+				continue
+			if fileEntry[self.FILE_SIZE] != st.st_size or fileEntry[self.FILE_MTIME] != st.st_mtime_ns or fileEntry[self.FILE_INODE] != st.st_ino:
+				files[fileName] = [st.st_size, st.st_mtime_ns, st.st_ino]
+				self.dirty = True
+
+	def __updateDirChain(self, relDir):
+		# make sure relDir and all parents exist in the index and carry their current mtime
+		chain = [relDir]
+		while chain[-1]:
+			chain.append(dirname(chain[-1]))
+		parent = None
+		for relDir in reversed(chain):  # root first
+			try:
+				dirMtime = stat(self.getAbsPath(relDir)).st_mtime_ns
+			except OSError:
+				dirMtime = 0
+			entry = self.dirs.get(relDir)
+			if entry is None:
+				entry = self.dirs[relDir] = [dirMtime, {}, []]
+			else:
+				entry[self.DIR_MTIME] = dirMtime
+			if parent is not None and basename(relDir) not in parent[self.DIR_SUBDIRS]:
+				parent[self.DIR_SUBDIRS].append(basename(relDir))
+			parent = entry
@@ -0,0 +1,160 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from os import scandir, stat
+from os.path import basename, join, splitext
+from stat import S_ISREG
+
+# PLUGIN IMPORTS
+from . import printToConsole
+
+
+SIDECAR_EXTENSIONS = (".ap", ".sc", ".cuts", ".meta")  # appended to the movie name: movie.ts.cuts
+EIT_EXTENSION = ".eit"  # replaces the movie extension: movie.eit
+
+
+class FileRecord(object):
+	# result of a single stat, passed to everyone who needs size, mtime or inode of the file
+	__slots__ = ("path", "size", "mtime", "inode", "device")
+
+	def __init__(self, path, size, mtime, inode, device):
+		self.path = path
+		self.size = size  # bytes
+		self.mtime = mtime  # ns
+		self.inode = inode
+		self.device = device
+
+	def getName(self):
+		return basename(self.path)
+
+	def __repr__(self):
+		return "FileRecord(%r, %d)" % (self.path, self.size)
+
+
+def scanFiles(mediapath, fileExtensions=None, recursive=False, excludeFilter=None):
+	# yields a FileRecord for every regular file. fileExtensions as tuple. example: ('.txt', '.png')
+	stack = [mediapath]
+	while stack:
+		dirPath = stack.pop()
+		subDirs = []
+		try:
+			with scandir(dirPath) as it:
+				for dirEntry in it:
+					try:
+						if dirEntry.is_dir(follow_symlinks=False):
+							subDirs.append(dirEntry.name)
+						elif dirEntry.is_file() and (fileExtensions is None or dirEntry.name.lower().endswith(fileExtensions)):
+							st = dirEntry.stat()
+							yield FileRecord(dirEntry.path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev)
+					except OSError:  # file removed while scanning
+						continue
+		except OSError as e:
+			printToConsole("[FileScanner] can't list '%s': %s" % (dirPath, str(e)))
+			continue
+		if recursive:
+			if excludeFilter is not None:
+				excludeFilter.pruneDirNames(dirPath, subDirs)
+			stack.extend(join(dirPath, subDir) for subDir in subDirs)
+
+
+def compareTrees(sourceRoot, targetRoot, excludeFilter=None, targetIndex=None):
+	# streaming merge-join of two trees. Both sides are listed one directory at a time and joined by name,
+	# yields (relPath, sourceRecord, targetRecord) for every source file, targetRecord is None if the file is
+	# missing in the target. Only the listings of one directory pair are held in memory. A valid targetIndex
+	# replaces the listing of the target, so the archive disk is not read
+	if excludeFilter is not None and excludeFilter.isExcludedTree(sourceRoot):
+		return
+	stack = [""]
+	while stack:
+		relDir = stack.pop()
+		sourceDir = join(sourceRoot, relDir) if relDir else sourceRoot
+		sourceRecords, subDirs = _listDir(sourceDir)
+		if sourceRecords:
+			targetDir = join(targetRoot, relDir) if relDir else targetRoot
+			targetRecords = targetIndex.getDirRecords(relDir) if targetIndex is not None else _listDir(targetDir)[0]
+			idx = 0
+			for sourceRecord in sourceRecords:  # both sorted by name
+				name = sourceRecord.getName()
+				while idx < len(targetRecords) and targetRecords[idx].getName() < name:
+					idx += 1
+				targetRecord = targetRecords[idx] if idx < len(targetRecords) and targetRecords[idx].getName() == name else None
+				yield join(relDir, name), sourceRecord, targetRecord
+		if excludeFilter is not None:
+			excludeFilter.pruneDirNames(sourceDir, subDirs)
+		stack.extend(join(relDir, subDir) for subDir in sorted(subDirs, reverse=True))  # depth first in name order
+
+
+def _listDir(dirPath):
+	# sorted FileRecords and the sub directory names of one directory
+	records = []
+	subDirs = []
+	try:
+		with scandir(dirPath) as it:
+			for dirEntry in it:
+				try:
+					if dirEntry.is_dir(follow_symlinks=False):
+						subDirs.append(dirEntry.name)
+					elif dirEntry.is_file():
+						st = dirEntry.stat()
+						records.append(FileRecord(dirEntry.path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev))
+				except OSError:  # file removed while listing
+					continue
+	except FileNotFoundError:  # not in the target yet
+		pass
+	except OSError as e:
+		printToConsole("[FileScanner] can't list '%s': %s" % (dirPath, str(e)))
+	records.sort(key=lambda record: record.getName())
+	return records, subDirs
+
+
+def listFileNames(dirPath):
+	# names of the regular files of a directory. The type comes from the directory entry, nothing is stat'ed
+	try:
+		with scandir(dirPath) as it:
+			return set(dirEntry.name for dirEntry in it if dirEntry.is_file())
+	except OSError as e:
+		printToConsole("[FileScanner] can't list '%s': %s" % (dirPath, str(e)))
+		return set()
+
+
+def getBundleNames(moviePath):
+	# file names of the recording bundle, the movie first. Known names only, "name.*" would also match "name.b.ts"
+	return [moviePath] + [moviePath + extension for extension in SIDECAR_EXTENSIONS] + [splitext(moviePath)[0] + EIT_EXTENSION]
+
+
+def getBundleRecords(moviePath, records=None):
+	# the recording bundle of a movie: its FileRecord first, then the sidecar files (.ts.ap, .ts.sc, .ts.cuts, .ts.meta, .eit).
+	# records are the related records if they are known already, otherwise the files of the bundle are stat'ed
+	if records is None:
+		records = [record for record in (statFile(path) for path in getBundleNames(moviePath)) if record is not None]
+	return sorted(records, key=lambda record: record.path != moviePath)  # stable, the sidecar files keep their order
+
+
+def statFile(path):
+	# FileRecord of a regular file or None if it doesnt exist
+	try:
+		st = stat(path)
+	except OSError:
+		return None
+	return FileRecord(path, st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev) if S_ISREG(st.st_mode) else None
@@ -0,0 +1,542 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+# PYTHON IMPORTS
+from errno import EINVAL, ENOSYS, EOPNOTSUPP, EXDEV
+from ctypes import CDLL
+from ctypes.util import find_library
+from hashlib import md5
+from os import close, fdatasync, fstat, fsync, ftruncate, link, lseek, open as osopen, read, rename, stat, uname, unlink, utime, write, O_CREAT, O_RDONLY, O_TRUNC, O_WRONLY, SEEK_SET
+from os.path import dirname, exists, normpath
+from threading import Lock
+from time import monotonic, sleep
+
+try:
+	from os import copy_file_range
+except ImportError:  # python < 3.8
+	copy_file_range = None
+try:
+	from os import sendfile
+except ImportError:
+	sendfile = None
+try:
+	from os import posix_fadvise, POSIX_FADV_DONTNEED
+except ImportError:
+	posix_fadvise = None
+
+# PLUGIN IMPORTS
+from .JobQueue import JobQueue
+
+
+class TransferCancelled(Exception):
+	pass
+
+
+class TransferPaused(Exception):
+	pass  # the partial target file is kept, the job continues at job.transferred
+
+
+class VerifyError(Exception):
+	pass
+
+
+class TokenBucket(object):
+	# limits the bandwidth of the transfers. rate in bytes per second, 0 is unlimited
+	def __init__(self, rate=0):
+		self.lock = Lock()
+		self.rate = rate
+		self.tokens = 0
+		self.lastRefill = monotonic()
+
+	def setRate(self, rate):
+		with self.lock:
+			self.rate = rate
+			self.tokens = min(self.tokens, rate)
+
+	def getRate(self):
+		return self.rate
+
+	def consume(self, count):
+		with self.lock:
+			now = monotonic()
+			if self.rate <= 0:
+				self.lastRefill = now
+				return
+			self.tokens = min(self.rate, self.tokens + (now - self.lastRefill) * self.rate)  # burst of max. one second
+			self.lastRefill = now
+			self.tokens -= count
+			wait = -self.tokens / self.rate if self.tokens < 0 else 0
+		if wait > 0:
+			sleep(wait)
+
+
+class IoPriority(object):
+	# ioprio_set/ioprio_get for the calling thread. There is no python binding, so the syscall is called via ctypes
+	SYSCALLS = (("mips64", ()), ("mips", (4314, 4315)), ("arm", (314, 315)), ("aarch64", (30, 31)), ("x86_64", (251, 252)), ("i686", (289, 290)), ("i586", (289, 290)), ("sh4", (288, 289)), ("ppc", (273, 274)))  # machine prefix, (set, get)
+	IOPRIO_WHO_PROCESS = 1
+	IOPRIO_CLASS_SHIFT = 13
+	IOPRIO_CLASS_IDLE = 3
+	libc = None
+	syscalls = None
+
+	@staticmethod
+	def __init():  # Private Methods
+		if IoPriority.syscalls is None:
+			machine = uname().machine
+			IoPriority.syscalls = next((value for key, value in IoPriority.SYSCALLS if machine.startswith(key)), ())
+			try:
+				IoPriority.libc = CDLL(find_library("c"), use_errno=True)
+			except OSError:
+				IoPriority.syscalls = ()
+		return len(IoPriority.syscalls) == 2
+
+	@staticmethod
+	def get():
+		if IoPriority.__init():
+			prio = IoPriority.libc.syscall(IoPriority.syscalls[1], IoPriority.IOPRIO_WHO_PROCESS, 0)
+			return prio if prio >= 0 else None
+		return None
+
+	@staticmethod
+	def set(prio):
+		if prio is not None and IoPriority.__init():
+			return IoPriority.libc.syscall(IoPriority.syscalls[0], IoPriority.IOPRIO_WHO_PROCESS, 0, prio) == 0
+		return False
+
+	@staticmethod
+	def setIdle():
+		return IoPriority.set(IoPriority.IOPRIO_CLASS_IDLE << IoPriority.IOPRIO_CLASS_SHIFT)
+
+
+class TransferJob(object):
+	MODE_COPY = "copy"
+	MODE_MOVE = "move"
+	MODE_APPEND = "append"  # backup of a grown file, the new tail is appended to the target from job.transferred on
+	MODE_REWRITE = "rewrite"  # small changed file, the target is overwritten in place
+	MODE_STREAM = "stream"  # restore, the target is written under its own name, so it can be played while it is copied
+	PART_EXTENSION = ".part"  # the target is written under this name and renamed when it is complete
+
+	def __init__(self, sourceFile, targetFile, mode=MODE_COPY, relPath=None, verify=False, priority=JobQueue.PRIORITY_AUTO):
+		self.sourceFile = sourceFile
+		self.targetFile = targetFile
+		self.mode = mode
+		self.relPath = relPath  # path relative to the target folder, used to update the target index
+		self.verify = verify  # hash while copying and compare with a re-read of the target before the source is deleted
+		self.checksum = None  # md5 hex digest of the copied data, only set for verified transfers
+		self.size = 0
+		self.transferred = 0  # bytes, updated by the worker thread during the transfer. A paused job continues here
+		self.hashState = None  # md5 object of a paused verified transfer
+		self.error = None
+		self.cancelled = False
+		self.paused = False
+		self.jobId = 0  # id in the JobJournal
+		self.priority = priority  # lower runs first, see JobQueue
+		self.disk = None  # physical disk of the target, set by the scheduler
+		self.sourceDisk = None  # physical disk of the source, a job only starts if both disks are idle
+		self.bundle = None  # BundleJob this file belongs to
+		self.linkFile = None  # file with the same content on the target disk, the target becomes a hardlink of it
+		self.fingerprint = None  # of the written target, stored in the target index
+
+	def getPartFile(self):
+		return self.targetFile + self.PART_EXTENSION
+
+	def getParts(self):
+		return [self]
+
+	def isBundle(self):
+		return False
+
+	def isInPlace(self):
+		return self.mode in (self.MODE_APPEND, self.MODE_REWRITE, self.MODE_STREAM)
+
+	def getWriteFile(self):
+		return self.targetFile if self.isInPlace() else self.getPartFile()
+
+	def cancel(self):
+		self.cancelled = True  # checked by the transfer at every chunk boundary
+
+	def getKey(self):
+		return normpath(self.sourceFile)  # a source file is queued once, regardless of its target
+
+	def __repr__(self):
+		return "%s '%s' -> '%s'" % (self.mode, self.sourceFile, self.targetFile)
+
+
+class BundleJob(TransferJob):
+	# a recording and its sidecar files (.ts.ap, .ts.sc, .ts.cuts, .ts.meta, .eit) transferred as one transaction:
+	# all files are copied to part files, then renamed and the sources are deleted last. A failed or stopped
+	# bundle leaves the sources complete and no orphaned movie without its index files on the target.
+	# size and transferred are the sums of all files, so a paused bundle continues at the same byte
+	def __init__(self, parts, verify=False, priority=JobQueue.PRIORITY_AUTO):
+		TransferJob.__init__(self, parts[0].sourceFile, parts[0].targetFile, parts[0].mode, None, verify, priority)  # parts[0] is the movie
+		self.parts = parts
+		self.readyOffset = None  # restore: bundle offset from which the movie can be played while the rest is copied
+		for part in parts:
+			part.bundle = self
+			part.verify = verify
+
+	def getParts(self):
+		return self.parts
+
+	def getCopyOrder(self):
+		return self.parts[1:] + self.parts[:1]  # sidecar files first, the movie last
+
+	def isBundle(self):
+		return True
+
+	def updateTransferred(self):
+		self.transferred = sum(part.transferred for part in self.parts)
+
+	def cancel(self):
+		self.cancelled = True
+		for part in self.parts:
+			part.cancel()
+
+
+class FileTransfer(object):
+	# copies or moves files without spawning a shell. Tries copy_file_range (in kernel copy), then
+	# sendfile and falls back to a plain read/write loop. Moves on the same filesystem are a rename
+	CHUNK_SIZE = 8 * 1024 * 1024
+	MIN_CHUNK_SIZE = 256 * 1024  # smallest chunk if the bandwidth is limited
+	SYNC_SIZE = 32 * 1024 * 1024  # written data is flushed (and dropped from the page cache) every SYNC_SIZE bytes
+	STATE_COPYING = "copying"
+	STATE_VERIFYING = "verifying"
+	FALLBACK_ERRNOS = (EXDEV, ENOSYS, EINVAL, EOPNOTSUPP)
+	useCopyFileRange = copy_file_range is not None
+	useSendfile = sendfile is not None
+
+	def __init__(self, bandwidth=None):
+		self.bandwidth = bandwidth if bandwidth is not None else TokenBucket()  # can be shared by parallel transfers
+		self.idleIoPriority = True
+		self.dropCache = posix_fadvise is not None
+		self.syncedOffset = 0
+		self.pauseRequested = False
+		self.stateCallback = None  # callable(job, state, offset), called by the worker thread at every sync point
+
+	def pause(self):
+		self.pauseRequested = True  # the running transfer stops at the next chunk boundary with TransferPaused
+
+	def resume(self):
+		self.pauseRequested = False
+
+	def transfer(self, job, linkFinder=None):
+		# linkFinder: callable(part) -> (file on the target disk with the same content, md5) or None. It reads
+		# the files to compare them, so it is called with the I/O priority of the transfer
+		oldPriority = IoPriority.get() if self.idleIoPriority else None
+		if oldPriority is not None:
+			IoPriority.setIdle()  # live recordings and playback always win against the archiver
+		try:
+			if linkFinder is not None:
+				self.__findLinks(job, linkFinder)
+			if job.isBundle():
+				self.__transferBundle(job)
+			else:
+				self.__transfer(job)
+		finally:
+			IoPriority.set(oldPriority)  # the worker thread is reused by the reactor thread pool
+
+	def __findLinks(self, job, linkFinder):  # Private Methods
+		for part in job.getParts():
+			if part.mode in (TransferJob.MODE_COPY, TransferJob.MODE_MOVE) and part.linkFile is None:
+				duplicate = linkFinder(part)
+				if duplicate is not None:
+					part.linkFile, part.checksum = duplicate
+
+	def __transfer(self, job):
+		st = stat(job.sourceFile)
+		job.size = st.st_size
+		job.paused = False
+		if job.transferred > 0 and not exists(job.getWriteFile()):  # partial file is gone, start again
+			job.transferred = 0
+		if job.mode in (TransferJob.MODE_APPEND, TransferJob.MODE_REWRITE) and self.__isLinked(job.targetFile):  # writing in place would change the other names of the file too
+			job.mode = TransferJob.MODE_COPY
+			job.transferred = 0
+			job.hashState = None
+		if job.mode == TransferJob.MODE_MOVE and self.__isSameDevice(st, job.targetFile):
+			rename(job.sourceFile, job.targetFile)
+			job.transferred = job.size
+			return
+		try:
+			self.__copyFile(job, st)
+			if not job.isInPlace():
+				rename(job.getPartFile(), job.targetFile)
+		except TransferPaused:
+			job.paused = True
+			raise
+		except BaseException as e:
+			job.transferred = 0
+			job.hashState = None
+			if not job.isInPlace():
+				if exists(job.getPartFile()):  # never leave a half written file
+					unlink(job.getPartFile())
+			elif (job.mode != TransferJob.MODE_APPEND or isinstance(e, VerifyError)) and exists(job.targetFile):  # an interrupted append is still a valid prefix
+				unlink(job.targetFile)
+			raise
+		if job.mode == TransferJob.MODE_MOVE:
+			self.__syncDirs([job.targetFile])  # the rename must be on the disk before the source is gone
+			unlink(job.sourceFile)
+
+	def __transferBundle(self, bundle):
+		parts = bundle.getCopyOrder()
+		stats = [stat(part.sourceFile) for part in parts]
+		bundle.size = sum(st.st_size for st in stats)
+		bundle.paused = False
+		if bundle.mode == TransferJob.MODE_MOVE and all(self.__isSameDevice(st, part.targetFile) for st, part in zip(stats, parts)):
+			self.__renameBundle(bundle)
+			return
+		offset = bundle.transferred  # distributed over the files in copy order, the first ones are complete
+		for st, part in zip(stats, parts):
+			part.size = st.st_size
+			part.transferred = min(offset, part.size)
+			offset -= part.transferred
+			if part.transferred > 0 and not exists(part.getWriteFile()):
+				part.transferred = 0
+		bundle.updateTransferred()
+		renamed = []
+		try:
+			for st, part in zip(stats, parts):
+				if part.checksum is None or part.linkFile is not None:  # verified parts of a paused bundle are complete, the others continue at part.transferred
+					self.__copyFile(part, st)  # every part file is on the disk before the first rename
+			for part in parts:  # sidecar files first, the movie appears last
+				if not part.isInPlace():
+					rename(part.getPartFile(), part.targetFile)
+				renamed.append(part)
+		except TransferPaused:
+			bundle.paused = True
+			raise
+		except BaseException:
+			for part in bundle.parts:
+				part.transferred = 0
+				part.hashState = None
+				part.checksum = None
+				if exists(part.getWriteFile()):
+					unlink(part.getWriteFile())
+			for part in renamed:  # the sources are still complete
+				if exists(part.targetFile):
+					unlink(part.targetFile)
+			bundle.transferred = 0
+			raise
+		if bundle.mode == TransferJob.MODE_MOVE:
+			self.__syncDirs([part.targetFile for part in parts])  # the renames must be on the disk before the sources are gone
+			for part in bundle.parts:  # movie first, an interruption never leaves a movie without its sidecar files
+				unlink(part.sourceFile)
+
+	def __renameBundle(self, bundle):
+		renamed = []
+		try:
+			for part in bundle.getCopyOrder():
+				rename(part.sourceFile, part.targetFile)
+				renamed.append(part)
+		except BaseException:
+			for part in renamed:  # all or nothing
+				rename(part.targetFile, part.sourceFile)
+			raise
+		bundle.transferred = bundle.size
+
+	def __syncDirs(self, fileNames):
+		# fsync of the directories makes the renames in them durable, after a power loss they could be lost otherwise
+		for dirName in set(dirname(fileName) for fileName in fileNames):
+			fd = osopen(dirName, O_RDONLY)
+			try:
+				fsync(fd)
+			finally:
+				close(fd)
+
+	def __isSameDevice(self, sourceStat, targetFile):
+		try:
+			return sourceStat.st_dev == stat(dirname(targetFile)).st_dev
+		except OSError:
+			return False
+
+	def __isLinked(self, fileName):
+		try:
+			return stat(fileName).st_nlink > 1
+		except OSError:
+			return False
+
+	def __copyFile(self, job, sourceStat):
+		if job.linkFile is not None:  # the content is on the target disk already, nothing is copied
+			if exists(job.getWriteFile()):
+				unlink(job.getWriteFile())
+			link(job.linkFile, job.getWriteFile())
+			job.transferred = job.size
+			self.__setState(job, self.STATE_COPYING, job.transferred)
+			return
+		fdIn = osopen(job.sourceFile, O_RDONLY)
+		try:
+			if job.verify and job.transferred > 0 and job.hashState is None:  # hash of the first part is unknown
+				if job.mode == TransferJob.MODE_APPEND:  # hash the existing part from the source, the whole target is compared after the append
+					job.hashState = self.__hashData(job, fdIn, job.transferred, True)
+				else:
+					job.transferred = 0
+			fdOut = osopen(job.getWriteFile(), O_WRONLY | O_CREAT | (0 if job.transferred > 0 else O_TRUNC), sourceStat.st_mode & 0o777)
+			try:
+				if job.transferred > 0:  # resume a paused transfer at the exact byte offset
+					if fstat(fdOut).st_size < job.transferred or job.transferred > job.size:
+						job.transferred = 0
+						job.hashState = None
+					ftruncate(fdOut, job.transferred)
+				self.syncedOffset = job.transferred
+				self.__setState(job, self.STATE_COPYING, job.transferred)
+				if job.verify:
+					if job.hashState is None:
+						job.hashState = md5()  # single read pass: the data is hashed while it is copied
+					self.__copyBuffered(job, fdIn, fdOut, job.hashState)
+					job.checksum = job.hashState.hexdigest()
+					job.hashState = None
+					fsync(fdOut)  # data must be on the disk before it is read back
+				else:
+					self.__copyData(job, fdIn, fdOut)
+				self.__sync(job, fdIn, fdOut, True)
+			finally:
+				close(fdOut)
+		finally:
+			close(fdIn)
+		if job.verify:
+			self.__setState(job, self.STATE_VERIFYING, job.transferred)
+			targetChecksum = self.__hashFile(job, job.getWriteFile())
+			if targetChecksum != job.checksum:
+				raise VerifyError("checksum mismatch %s != %s" % (targetChecksum, job.checksum))
+		utime(job.getWriteFile(), ns=(sourceStat.st_atime_ns, sourceStat.st_mtime_ns))  # keep the recording time like mv does
+
+	def __copyData(self, job, fdIn, fdOut):
+		if self.useCopyFileRange and self.__copyFileRange(job, fdIn, fdOut):
+			return
+		if self.useSendfile and self.__sendfile(job, fdIn, fdOut):
+			return
+		self.__copyBuffered(job, fdIn, fdOut)
+
+	def __copyFileRange(self, job, fdIn, fdOut):
+		startOffset = job.transferred  # copy_file_range uses explicit offsets
+		try:
+			while True:
+				self.__checkCancelled(job)
+				count = copy_file_range(fdIn, fdOut, self.__getChunkSize(), job.transferred, job.transferred)
+				if count == 0:
+					return True
+				job.transferred += count
+				self.__chunkDone(job, fdIn, fdOut, count)
+		except OSError as e:
+			if job.transferred > startOffset or e.errno not in self.FALLBACK_ERRNOS:
+				raise
+			if e.errno == ENOSYS:
+				FileTransfer.useCopyFileRange = False
+			return False
+
+	def __sendfile(self, job, fdIn, fdOut):
+		startOffset = job.transferred
+		lseek(fdOut, job.transferred, SEEK_SET)  # sendfile writes at the file position of the target
+		try:
+			while True:
+				self.__checkCancelled(job)
+				count = sendfile(fdOut, fdIn, job.transferred, self.__getChunkSize())
+				if count == 0:
+					return True
+				job.transferred += count
+				self.__chunkDone(job, fdIn, fdOut, count)
+		except OSError as e:
+			if job.transferred > startOffset or e.errno not in self.FALLBACK_ERRNOS:
+				raise
+			if e.errno == ENOSYS:
+				FileTransfer.useSendfile = False
+			return False
+
+	def __copyBuffered(self, job, fdIn, fdOut, checksum=None):
+		lseek(fdIn, job.transferred, SEEK_SET)
+		lseek(fdOut, job.transferred, SEEK_SET)
+		while True:
+			self.__checkCancelled(job)
+			data = read(fdIn, self.__getChunkSize())
+			if not data:
+				break
+			if checksum is not None:
+				checksum.update(data)
+			view = memoryview(data)
+			while view:
+				count = write(fdOut, view)
+				view = view[count:]
+			job.transferred += len(data)
+			self.__chunkDone(job, fdIn, fdOut, len(data))
+
+	def __getChunkSize(self):
+		rate = self.bandwidth.getRate()
+		return self.CHUNK_SIZE if rate <= 0 else max(self.MIN_CHUNK_SIZE, min(self.CHUNK_SIZE, rate // 4))
+
+	def __chunkDone(self, job, fdIn, fdOut, count):
+		if job.bundle is not None:
+			job.bundle.updateTransferred()
+		self.bandwidth.consume(count)
+		self.__sync(job, fdIn, fdOut)
+
+	def __sync(self, job, fdIn, fdOut, final=False):
+		# flush the written data, so job.transferred up to here survives a crash. The copied data is
+		# not needed again, it is dropped from the page cache to keep it for recordings and playback
+		length = job.transferred - self.syncedOffset
+		if length > 0 and (final or length >= self.SYNC_SIZE):
+			fdatasync(fdOut)  # dirty pages can't be dropped
+			if self.dropCache:
+				posix_fadvise(fdOut, self.syncedOffset, length, POSIX_FADV_DONTNEED)
+				posix_fadvise(fdIn, self.syncedOffset, length, POSIX_FADV_DONTNEED)
+			self.syncedOffset = job.transferred
+			if not final:
+				self.__setState(job, self.STATE_COPYING, job.transferred)
+
+	def __setState(self, job, state, offset):
+		if job.bundle is not None:  # the journal knows the bundle only
+			job.bundle.updateTransferred()
+			job, offset = job.bundle, job.bundle.transferred
+		if self.stateCallback is not None:
+			self.stateCallback(job, state, offset)
+
+	def __hashFile(self, job, fileName):
+		fd = osopen(fileName, O_RDONLY)
+		try:
+			if posix_fadvise is not None:  # drop the cached pages, so the data is read from the disk and not from the page cache
+				posix_fadvise(fd, 0, 0, POSIX_FADV_DONTNEED)
+			checksum = self.__hashData(job, fd)  # the verify read is not paused, it would need to start again
+			if posix_fadvise is not None:
+				posix_fadvise(fd, 0, 0, POSIX_FADV_DONTNEED)
+		finally:
+			close(fd)
+		return checksum.hexdigest()
+
+	def __hashData(self, job, fd, length=None, pausable=False):
+		# md5 object of the first length bytes (all if None)
+		checksum = md5()
+		lseek(fd, 0, SEEK_SET)
+		remaining = length
+		while remaining is None or remaining > 0:
+			self.__checkCancelled(job, pausable)
+			data = read(fd, self.__getChunkSize() if remaining is None else min(remaining, self.__getChunkSize()))
+			if not data:
+				break
+			checksum.update(data)
+			self.bandwidth.consume(len(data))
+			if remaining is not None:
+				remaining -= len(data)
+		return checksum
+
+	def __checkCancelled(self, job, pausable=True):
+		if job.cancelled:
+			raise TransferCancelled()
+		if pausable and self.pauseRequested and job.mode != TransferJob.MODE_REWRITE:  # a rewrite in place is finished, the target would stay half written
+			raise TransferPaused()
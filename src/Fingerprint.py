@@ -0,0 +1,136 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from collections import OrderedDict
+from hashlib import md5
+from json import dumps, load
+from os import close, fstat, lseek, open as osopen, read, O_RDONLY, SEEK_SET
+from os.path import exists
+from threading import Lock
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+
+
+class FingerprintCache(object):
+	# content fingerprint of a file: md5 over the size and a few fixed blocks (head, middle, tail).
+	# The result is memoised by (device, inode, size, mtime_ns), so unchanged files are never read again
+	instance = None
+	BLOCK_SIZE = 64 * 1024
+	MAX_ENTRIES = 50000  # least recently used entries are dropped. Archive files keep their fingerprint in the FileIndex, not here
+
+	def __init__(self, cacheFile=None):
+		self.cacheFile = cacheFile or getDataFile("fingerprints.json")
+		self.entries = OrderedDict()
+		self.lock = Lock()  # fingerprints are also calculated by the transfer thread
+		self.dirty = False
+		self.load()
+
+	@staticmethod
+	def getInstance():
+		if FingerprintCache.instance is None:
+			FingerprintCache.instance = FingerprintCache()
+		return FingerprintCache.instance
+
+	def load(self):
+		if exists(self.cacheFile):
+			try:
+				with open(self.cacheFile, "r") as f:
+					self.entries = OrderedDict(load(f))
+			except Exception as e:
+				printToConsole("[FingerprintCache] can't load '%s': %s" % (self.cacheFile, str(e)))
+				self.entries = OrderedDict()
+
+	def save(self):
+		with self.lock:
+			if not self.dirty:
+				return
+			data = list(self.entries.items())
+			self.dirty = False
+		saveDataFile(self.cacheFile, dumps(data, separators=(",", ":")))
+
+	def getFingerprint(self, fileName, device=None, inode=None, size=None, mtime=None, cache=True):
+		# device, inode, size and mtime can be passed from an index entry, otherwise the opened file is stat'ed.
+		# cache=False for files whose fingerprint is stored elsewhere (FileIndex), they dont push the others out
+		key = self.getKey(device, inode, size, mtime) if None not in (device, inode, size, mtime) else None
+		if key is not None:
+			with self.lock:
+				fingerprint = self.entries.get(key)
+				if fingerprint is not None:
+					self.entries.move_to_end(key)
+					return fingerprint
+		fd = osopen(fileName, O_RDONLY)
+		try:
+			st = fstat(fd)
+			key = self.getKey(st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+			with self.lock:
+				fingerprint = self.entries.get(key)
+			if fingerprint is None:
+				fingerprint = self.__calculate(fd, st.st_size)
+				if cache:
+					self.add(key, fingerprint)
+		finally:
+			close(fd)
+		return fingerprint
+
+	def getPrefixFingerprint(self, fileName, length):
+		# fingerprint of the first length bytes, sampled like a file of this size. It is equal to the fingerprint
+		# of a copy which stopped at length, so a grown file can be checked against its old copy. Not cached
+		fd = osopen(fileName, O_RDONLY)
+		try:
+			if fstat(fd).st_size < length:
+				return None
+			return self.__calculate(fd, length)
+		finally:
+			close(fd)
+
+	def add(self, key, fingerprint):
+		with self.lock:
+			self.entries[key] = fingerprint
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.MAX_ENTRIES:
+				self.entries.popitem(last=False)
+			self.dirty = True
+
+	def getKey(self, device, inode, size, mtime):
+		return "%d:%d:%d:%d" % (device, inode, size, mtime)
+
+	def __calculate(self, fd, size):  # Private Methods
+		fingerprint = md5(str(size).encode("ascii"))
+		if size <= 3 * self.BLOCK_SIZE:  # small files (meta, cuts, eit) are hashed completely
+			offsets = [0]
+			blockSize = size
+		else:
+			offsets = [0, (size - self.BLOCK_SIZE) // 2, size - self.BLOCK_SIZE]
+			blockSize = self.BLOCK_SIZE
+		for offset in offsets:
+			lseek(fd, offset, SEEK_SET)
+			remaining = blockSize
+			while remaining > 0:
+				data = read(fd, remaining)
+				if not data:
+					break
+				fingerprint.update(data)
+				remaining -= len(data)
+		return fingerprint.hexdigest()
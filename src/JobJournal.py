@@ -0,0 +1,133 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from json import dumps, loads
+from os import fsync, unlink
+from os.path import exists
+from threading import Lock
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+
+
+class JobJournal(object):
+	# append-only journal of the transfer queue, one json object per line. The last line of a job wins,
+	# so a restart (or crash) can continue all jobs which are not done at their last synced byte offset
+	STATE_PENDING = "pending"
+	STATE_COPYING = "copying"
+	STATE_VERIFYING = "verifying"
+	STATE_DONE = "done"
+	OFFSET_INTERVAL = 256 * 1024 * 1024  # write the offset of a running copy every 256 MB, not every chunk (flash)
+
+	def __init__(self, journalFile=None):
+		self.journalFile = journalFile or getDataFile("journal.log")
+		self.lock = Lock()
+		self.syncLock = Lock()  # one writer of the journal file at a time, keeps the order of the lines
+		self.pendingLines = []  # appended by sync() with a single fsync, not on the reactor thread
+		self.jobs = {}  # id -> last entry of unfinished jobs, in queue order
+		self.nextId = 1
+		self.load()
+
+	def load(self):
+		self.jobs = {}
+		if exists(self.journalFile):
+			with open(self.journalFile, "r") as f:
+				for line in f:
+					try:
+						entry = loads(line)
+					except ValueError:  # torn last line after a crash
+						continue
+					jobId = entry.get("id", 0)
+					self.nextId = max(self.nextId, jobId + 1)
+					if entry.get("state") == self.STATE_DONE:
+						self.jobs.pop(jobId, None)
+					elif jobId in self.jobs:
+						self.jobs[jobId].update(entry)
+					elif "source" in entry:
+						self.jobs[jobId] = entry
+
+	def getUnfinished(self):
+		with self.lock:
+			return [dict(entry) for entry in self.jobs.values()]
+
+	def add(self, job):
+		with self.lock:
+			job.jobId = self.nextId
+			self.nextId += 1
+			entry = {"id": job.jobId, "state": self.STATE_PENDING, "offset": job.transferred, "source": job.sourceFile, "target": job.targetFile, "mode": job.mode, "relPath": job.relPath, "verify": job.verify, "priority": job.priority}
+			if job.isBundle():
+				entry["files"] = [[part.sourceFile, part.targetFile] for part in job.getParts()]
+			self.jobs[job.jobId] = entry
+			self.__append(entry)
+
+	def update(self, job, state, offset=None):
+		with self.lock:
+			entry = self.jobs.get(job.jobId)
+			if entry is None:
+				return
+			if state == self.STATE_DONE:
+				del self.jobs[job.jobId]
+				self.__append({"id": job.jobId, "state": state})
+				return
+			if offset is None:
+				offset = entry["offset"]
+			elif state == entry["state"] and offset - entry["offset"] < self.OFFSET_INTERVAL:
+				return
+			entry["state"] = state
+			entry["offset"] = offset
+			self.__append({"id": job.jobId, "state": state, "offset": offset})
+
+	def sync(self):
+		# write all buffered entries to the journal with one fsync
+		with self.syncLock:
+			with self.lock:
+				lines = self.pendingLines
+				self.pendingLines = []
+			if not lines:
+				return
+			try:
+				with open(self.journalFile, "a") as f:
+					f.write("".join(lines))
+					f.flush()
+					fsync(f.fileno())
+			except (IOError, OSError) as e:
+				printToConsole("[JobJournal] can't write '%s': %s" % (self.journalFile, str(e)))
+
+	def clear(self):
+		with self.lock:
+			self.jobs = {}
+		self.compact()
+
+	def compact(self):
+		# rewrite the journal with the unfinished jobs only. Written to a temp file and renamed, a crash keeps the old journal
+		with self.syncLock, self.lock:
+			self.pendingLines = []  # contained in the rewritten journal
+			if not self.jobs:
+				if exists(self.journalFile):
+					unlink(self.journalFile)
+				return
+			saveDataFile(self.journalFile, "".join(dumps(entry) + "\n" for entry in self.jobs.values()))
+
+	def __append(self, entry):  # Private Methods
+		self.pendingLines.append(dumps(entry) + "\n")
@@ -0,0 +1,109 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from collections import OrderedDict
+
+
+class JobQueue(object):
+	# transfer queue with a hash index on the job key (normalized source path). Jobs are kept in one
+	# ordered dict per priority, so add, lookup, remove and pop are O(1) and jobs of the same priority keep their order
+	PRIORITY_MANUAL = 0  # "Archive now!" runs ahead of automatic runs
+	PRIORITY_AUTO = 10
+
+	def __init__(self):
+		self.queues = {}  # priority -> OrderedDict(key -> job)
+		self.priorities = {}  # key -> priority of the queued job
+
+	def __len__(self):
+		return len(self.priorities)
+
+	def __contains__(self, key):
+		return key in self.priorities
+
+	def __iter__(self):
+		# jobs in the order they will run
+		for priority in sorted(self.queues):
+			for job in list(self.queues[priority].values()):
+				yield job
+
+	def add(self, job):
+		# returns False if a job with the same key is queued already. A queued job is moved up
+		# if it is requested again with a higher priority
+		key = job.getKey()
+		priority = self.priorities.get(key)
+		if priority is not None:
+			if job.priority < priority:
+				queuedJob = self.queues[priority].pop(key)
+				queuedJob.priority = job.priority
+				self.__insert(key, queuedJob)
+			return False
+		self.__insert(key, job)
+		return True
+
+	def pushFront(self, job):
+		# paused job, continues before all other jobs of its priority
+		key = job.getKey()
+		self.remove(key)
+		self.__insert(key, job)
+		self.queues[job.priority].move_to_end(key, last=False)
+
+	def get(self, key):
+		priority = self.priorities.get(key)
+		return self.queues[priority][key] if priority is not None else None
+
+	def remove(self, key):
+		priority = self.priorities.pop(key, None)
+		if priority is None:
+			return None
+		job = self.queues[priority].pop(key)
+		if not self.queues[priority]:
+			del self.queues[priority]
+		return job
+
+	def popNext(self, accept=None):
+		# next job in order. With accept the next job accept(job) is true for, jobs before it keep their place
+		if not self.priorities:
+			return None
+		if accept is None:
+			priority = min(self.queues)
+			key, job = self.queues[priority].popitem(last=False)
+			del self.priorities[key]
+			if not self.queues[priority]:
+				del self.queues[priority]
+			return job
+		for job in self:
+			if accept(job):
+				return self.remove(job.getKey())
+		return None
+
+	def clear(self):
+		self.queues = {}
+		self.priorities = {}
+
+	def __insert(self, key, job):  # Private Methods
+		queue = self.queues.get(job.priority)
+		if queue is None:
+			queue = self.queues[job.priority] = OrderedDict()
+		queue[key] = job
+		self.priorities[key] = job.priority
@@ -0,0 +1,165 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from os import access, major, makedev, minor, W_OK
+from os.path import basename, dirname, exists, isdir, isfile, join, realpath
+from select import poll, POLLERR, POLLPRI
+from threading import Lock
+from time import monotonic
+
+# PLUGIN IMPORTS
+from . import printToConsole
+
+
+class MountInfo(object):
+	__slots__ = ("mountpoint", "device", "readOnly")
+
+	def __init__(self, mountpoint, device, readOnly):
+		self.mountpoint = mountpoint
+		self.device = device
+		self.readOnly = readOnly
+
+
+class MountCache(object):
+	# resolves mountpoint, device id and writability from /proc/self/mountinfo instead of calling ismount for
+	# every parent folder. All results are dropped when the kernel reports a change of the mount table
+	instance = None
+	MOUNTINFO = "/proc/self/mountinfo"
+	CHECK_INTERVAL = 1.0  # seconds between two checks of the mount table
+	SYS_BLOCK = "/sys/dev/block"
+
+	def __init__(self):
+		self.lock = Lock()
+		self.mounts = {}  # mountpoint -> MountInfo
+		self.mountpoints = {}  # path -> MountInfo
+		self.writeable = set()  # only positive results are cached, a missing folder may be created or mounted later
+		self.disks = {}  # device -> name of the physical disk
+		self.lastCheck = 0
+		self.mountinfo = None
+		self.poller = None
+		self.lastContent = None
+		try:
+			self.mountinfo = open(self.MOUNTINFO, "r")
+			self.poller = poll()
+			self.poller.register(self.mountinfo.fileno(), POLLPRI | POLLERR)
+		except (IOError, OSError) as e:
+			printToConsole("[MountCache] can't watch %s: %s" % (self.MOUNTINFO, str(e)))
+		self.__reload()
+
+	@staticmethod
+	def getInstance():
+		if MountCache.instance is None:
+			MountCache.instance = MountCache()
+		return MountCache.instance
+
+	def getMountInfo(self, mediapath):
+		with self.lock:
+			self.__checkMountTable()
+			info = self.mountpoints.get(mediapath)
+			if info is None:
+				path = realpath(mediapath)
+				while path not in self.mounts and path != dirname(path):
+					path = dirname(path)
+				info = self.mounts.get(path)
+				if info is None:  # no mount table available
+					info = MountInfo(path, 0, False)
+				self.mountpoints[mediapath] = info
+			return info
+
+	def getMountpoint(self, mediapath):
+		return self.getMountInfo(mediapath).mountpoint
+
+	def getDevice(self, mediapath):
+		return self.getMountInfo(mediapath).device
+
+	def getDisk(self, mediapath):
+		# name of the physical disk of a path (sda for /dev/sda1). Partitions of one disk share the same
+		# spindle, devices without a block device (network mounts) are their own disk
+		device = self.getDevice(mediapath)
+		with self.lock:
+			disk = self.disks.get(device)
+		if disk is None:
+			disk = "%d:%d" % (major(device), minor(device))
+			blockPath = join(self.SYS_BLOCK, disk)
+			if isdir(blockPath):
+				blockPath = realpath(blockPath)  # /sys/devices/.../block/sda/sda1
+				if exists(join(blockPath, "partition")):
+					blockPath = dirname(blockPath)
+				disk = basename(blockPath)
+			with self.lock:
+				self.disks[device] = disk
+		return disk
+
+	def isWriteable(self, mediapath):
+		with self.lock:
+			self.__checkMountTable()
+			if mediapath in self.writeable:
+				return True
+		folder = dirname(mediapath) if isfile(mediapath) else mediapath
+		info = self.getMountInfo(folder)
+		result = not info.readOnly and isdir(folder) and access(folder, W_OK)
+		if result:
+			with self.lock:
+				self.writeable.add(mediapath)
+		return result
+
+	def __checkMountTable(self):  # Private Methods
+		now = monotonic()
+		if now - self.lastCheck < self.CHECK_INTERVAL:
+			return
+		self.lastCheck = now
+		if self.poller is not None:
+			if self.poller.poll(0):  # mount table changed since the last read
+				self.__reload()
+		elif self.__readMountTable() != self.lastContent:
+			self.__reload()
+
+	def __readMountTable(self):
+		try:
+			if self.mountinfo is not None:
+				self.mountinfo.seek(0)
+				return self.mountinfo.read()  # reading the table also resets the poll event
+			with open(self.MOUNTINFO, "r") as f:
+				return f.read()
+		except (IOError, OSError):
+			return ""
+
+	def __reload(self):
+		self.lastContent = self.__readMountTable()
+		self.mounts = {}
+		for line in self.lastContent.splitlines():
+			# 36 35 98:0 /mnt1 /mnt/parent rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+			fields = line.split()
+			if len(fields) < 6:
+				continue
+			major, minor = fields[2].split(":")
+			mountpoint = self.__unescape(fields[4])
+			self.mounts[mountpoint] = MountInfo(mountpoint, makedev(int(major), int(minor)), "ro" in fields[5].split(","))
+		self.mountpoints = {}
+		self.writeable = set()
+		self.disks = {}
+		self.lastCheck = monotonic()
+
+	def __unescape(self, path):
+		return path.replace("\\040", " ").replace("\\011", "\t").replace("\\012", "\n").replace("\\134", "\\")
@@ -0,0 +1,246 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from heapq import merge
+from os import stat, statvfs
+from time import time
+
+GB = 1024 * 1024 * 1024
+MB = 1024 * 1024
+
+
+class DiskSnapshot(object):
+	# one statvfs of a disk, all planning works on this snapshot
+	__slots__ = ("path", "free", "total", "timestamp")
+
+	def __init__(self, path):
+		self.path = path
+		try:
+			st = statvfs(path)
+			self.free = (st.f_bavail if st.f_bavail != 0 else st.f_bfree) * st.f_bsize  # bytes
+			self.total = st.f_blocks * st.f_frsize
+		except OSError:
+			self.free = 0
+			self.total = 0
+		self.timestamp = time()
+
+	def getBytesToFree(self, limit):
+		return max(0, limit * GB - self.free)  # limit in GB like the config
+
+	def getHeadroom(self, limit):
+		return max(0, self.free - limit * GB)
+
+
+class SourceDisk(object):
+	# movie disk of a plan. Movie folders on the same filesystem share one snapshot, so their
+	# movies are counted against one limit (the highest limit of these folders)
+	__slots__ = ("paths", "snapshot", "limit", "bytesToFree", "plannedBytes")
+
+	def __init__(self, path, limit):
+		self.paths = [path]
+		self.snapshot = DiskSnapshot(path)
+		self.limit = limit
+		self.bytesToFree = self.snapshot.getBytesToFree(limit)
+		self.plannedBytes = 0
+
+	def addPath(self, path, limit):
+		self.paths.append(path)
+		if limit > self.limit:
+			self.limit = limit
+			self.bytesToFree = self.snapshot.getBytesToFree(limit)
+
+	def isSatisfied(self):
+		return self.plannedBytes >= self.bytesToFree
+
+
+class ArchiveTarget(object):
+	# archive disk of a plan. The headroom shrinks with every movie placed on it
+	__slots__ = ("path", "snapshot", "headroom", "plannedBytes")
+
+	def __init__(self, path, limit):
+		self.path = path
+		self.snapshot = DiskSnapshot(path)
+		self.headroom = self.snapshot.getHeadroom(limit)
+		self.plannedBytes = 0
+
+
+class PlanItem(object):
+	# a movie with its meta files, moved as one unit
+	__slots__ = ("movie", "records", "size", "sourcePath", "source", "target", "score")
+
+	def __init__(self, movie, records, sourcePath=None, score=None):
+		self.movie = movie  # FileRecord of the movie
+		self.records = records  # FileRecords of movie and meta files
+		self.size = sum(record.size for record in records)
+		self.sourcePath = sourcePath  # movie folder the movie was found in
+		self.source = None  # SourceDisk, set by the planner
+		self.target = None  # path of the archive folder the movie is placed on
+		self.score = score  # coldness of the movie (STRATEGY_COLDEST), higher is archived first
+
+
+class ArchivePlan(object):
+	STRATEGY_OLDEST = "oldest"
+	STRATEGY_FEWEST_BYTES = "fewest"
+	STRATEGY_COLDEST = "coldest"
+
+	def __init__(self, sources, targets, strategy):
+		self.sources = sources  # SourceDisks
+		self.targets = targets  # ArchiveTargets
+		self.strategy = strategy
+		self.bytesToFree = sum(source.bytesToFree for source in sources)
+		self.targetHeadroom = sum(target.headroom for target in targets)
+		self.items = []
+		self.plannedBytes = 0
+		self.candidates = 0
+		self.duration = 0.0
+
+	def add(self, item, target):
+		item.target = target.path
+		target.headroom -= item.size
+		target.plannedBytes += item.size
+		item.source.plannedBytes += item.size
+		self.items.append(item)
+		self.plannedBytes += item.size
+
+	def getTarget(self, size):
+		# the archive disk with the most headroom, None if the size doesnt fit anywhere
+		target = max(self.targets, key=lambda target: target.headroom) if self.targets else None
+		return target if target is not None and size <= target.headroom else None
+
+	def getMaxHeadroom(self):
+		return max([target.headroom for target in self.targets] or [0])
+
+	def isEmpty(self):
+		return len(self.items) == 0
+
+	def isSatisfied(self):
+		return all(source.isSatisfied() for source in self.sources)
+
+	def getSummary(self):
+		return "plan (%s): free %d MB of %d MB needed on %d disks, %d movies (%d candidates), archive headroom %d MB on %d disks, %.2fs" % (self.strategy, self.plannedBytes // MB, self.bytesToFree // MB, len(self.sources), len(self.items), self.candidates, self.targetHeadroom // MB, len(self.targets), self.duration)
+
+
+class SpacePlanner(object):
+	# decides once which movies have to be moved: enough to get every movie disk over its limit,
+	# never more than fits into the archive disks without crossing their limits. Every movie is
+	# placed on the archive disk with the most headroom, which spreads the movies over all disks
+	MAX_SUM_BITS = 256 * 1024  # resolution of the fewest bytes subset sum, about 2 MB for a 500 GB gap
+
+	def plan(self, sources, targets, candidates, strategy=ArchivePlan.STRATEGY_OLDEST):
+		# sources: (path, limit) of the movie folders, targets: (path, limit) of the archive folders
+		# candidates: one iterable of PlanItems per movie folder, oldest (coldest for STRATEGY_COLDEST) first. They can be
+		# generators, they are merged into one stream in this order and only consumed as far as needed
+		startTime = time()
+		sourceDisks = self.__getSourceDisks(sources)
+		plan = ArchivePlan(list(dict.fromkeys(sourceDisks)), [ArchiveTarget(path, limit) for path, limit in targets], strategy)
+		if plan.bytesToFree > 0:
+			streams = [self.__assignSource(folderCandidates, sourceDisk) for folderCandidates, sourceDisk in zip(candidates, sourceDisks) if sourceDisk.bytesToFree > 0]
+			if strategy == ArchivePlan.STRATEGY_FEWEST_BYTES:
+				self.__planFewestBytes(plan, streams)
+			elif strategy == ArchivePlan.STRATEGY_COLDEST:
+				self.__planOldest(plan, merge(*streams, key=lambda item: -item.score))
+			else:
+				self.__planOldest(plan, merge(*streams, key=lambda item: item.movie.mtime))
+		plan.duration = time() - startTime
+		return plan
+
+	def planRestore(self, sources, sourcePath, size, plannedBytes=0):
+		# the SourceDisk of sourcePath if size more bytes (plus plannedBytes of queued restores) keep it over its limit, otherwise None
+		sourceDisk = self.__getSourceDisks(sources + [(sourcePath, 0)])[-1]  # folders on the same filesystem share the highest limit
+		return sourceDisk if sourceDisk.snapshot.getHeadroom(sourceDisk.limit) >= size + plannedBytes else None
+
+	def __getSourceDisks(self, sources):  # Private Methods
+		# one SourceDisk per filesystem, in the order of the sources
+		sourceDisks = []
+		devices = {}
+		for path, limit in sources:
+			try:
+				device = stat(path).st_dev
+			except OSError:
+				device = path
+			if device in devices:
+				devices[device].addPath(path, limit)
+			else:
+				devices[device] = SourceDisk(path, limit)
+			sourceDisks.append(devices[device])
+		return sourceDisks
+
+	def __assignSource(self, candidates, sourceDisk):
+		for item in candidates:
+			item.source = sourceDisk
+			yield item
+
+	def __planOldest(self, plan, candidates):
+		for item in candidates:
+			plan.candidates += 1
+			if item.source.isSatisfied():  # enough planned on this movie disk
+				continue
+			target = plan.getTarget(item.size)
+			if target is None:  # doesnt fit into the archive anymore, try the next one
+				continue
+			plan.add(item, target)
+			if plan.isSatisfied():
+				break
+
+	def __planFewestBytes(self, plan, streams):
+		# per movie disk: the movies whose sizes add up to the smallest total which frees the needed bytes
+		pools = {}
+		for item in (item for stream in streams for item in stream):
+			if item.size > 0:
+				pools.setdefault(item.source, []).append(item)
+		for source in plan.sources:
+			pool = pools.get(source, [])
+			plan.candidates += len(pool)
+			self.__planFewestBytesOfSource(plan, source, pool)
+
+	def __planFewestBytesOfSource(self, plan, source, pool):
+		# subset sum over the sizes in units of a few MB at most, the reachable totals are the bits of one int per movie.
+		# If the movies or the archive headroom are not enough, the biggest reachable total is taken
+		neededBytes = source.bytesToFree - source.plannedBytes
+		maxHeadroom = plan.getMaxHeadroom()
+		pool = [item for item in pool if item.size <= maxHeadroom]
+		if neededBytes <= 0 or not pool:
+			return
+		poolBytes = sum(item.size for item in pool)
+		if poolBytes <= neededBytes:  # all movies are needed
+			chosen = pool
+		else:
+			unit = 1 << ((min(neededBytes + max(item.size for item in pool), poolBytes) - 1) // self.MAX_SUM_BITS).bit_length()  # power of two, the bitsets stay small for any disk size
+			needed = -(-neededBytes // unit)  # rounded up, the sizes are rounded down
+			capacity = min(sum(target.headroom for target in plan.targets) // unit, needed + max(item.size for item in pool) // unit)
+			mask = (1 << (capacity + 1)) - 1
+			reachable = [1]  # reachable[i]: bit n is set if n units can be freed with the first i movies
+			for item in pool:
+				reachable.append((reachable[-1] | (reachable[-1] << (item.size // unit))) & mask)
+			above = reachable[-1] >> needed
+			total = needed + (above & -above).bit_length() - 1 if above else reachable[-1].bit_length() - 1
+			chosen = []
+			for idx in range(len(pool), 0, -1):  # walk back: a total not reachable without movie idx - 1 needs it
+				if not (reachable[idx - 1] >> total) & 1:
+					chosen.append(pool[idx - 1])
+					total -= pool[idx - 1].size // unit
+		for item in sorted(chosen, key=lambda item: item.size, reverse=True):  # biggest first, they are the hardest to place
+			target = plan.getTarget(item.size)
+			if target is not None:
+				plan.add(item, target)
@@ -0,0 +1,93 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from json import dumps, load
+from os import stat
+from os.path import exists
+from time import time
+
+# PLUGIN IMPORTS
+from . import printToConsole, getDataFile, saveDataFile
+
+
+class SpinupBatcher(object):
+	# recordings finished since the last archive run, kept on the flash instead of waking the archive disk
+	# for every recording. The run is due when the pending bytes pass the batch size or the oldest pending
+	# recording reaches the max age, then all of them are transferred in one spin-up
+	def __init__(self, batchFile=None):
+		self.batchFile = batchFile or getDataFile("spinup_batch.json")
+		self.files = {}  # recording -> size when it was finished
+		self.since = 0  # time of the oldest pending recording, 0 if nothing is pending
+		self.load()
+
+	def load(self):
+		if exists(self.batchFile):
+			try:
+				with open(self.batchFile, "r") as f:
+					data = load(f)
+				self.files = data.get("files", {})
+				self.since = data.get("since", 0)
+			except Exception as e:
+				printToConsole("[SpinupBatcher] can't load '%s': %s" % (self.batchFile, str(e)))
+				self.files = {}
+				self.since = 0
+
+	def save(self):
+		saveDataFile(self.batchFile, dumps({"since": self.since, "files": self.files}, separators=(",", ":")))  # survives a restart, the max age counts from the first recording
+
+	def add(self, fileName=None):
+		# the recording is on the movie disk, which is awake anyway. Without a file name only the age counts
+		size = 0
+		if fileName:
+			try:
+				size = stat(fileName).st_size
+			except OSError:
+				pass
+			self.files[fileName] = size
+		if not self.since:
+			self.since = time()
+		self.save()
+		return size
+
+	def clear(self):
+		# the archive disk was woken up, the run picks up everything that is pending
+		if self.since:
+			self.files = {}
+			self.since = 0
+			self.save()
+
+	def isPending(self):
+		return self.since > 0
+
+	def getPendingBytes(self):
+		return sum(self.files.values())
+
+	def getTimeLeft(self, maxAge):
+		# seconds until the oldest pending recording reaches maxAge, None if nothing is pending
+		if not self.since:
+			return None
+		return max(0, int(self.since + maxAge - time()))
+
+	def isDue(self, batchSize, maxAge):
+		return self.isPending() and (self.getPendingBytes() >= batchSize or self.getTimeLeft(maxAge) == 0)
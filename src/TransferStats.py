@@ -0,0 +1,166 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from collections import deque
+from json import dumps
+from os.path import basename
+from time import monotonic, time
+
+# PLUGIN IMPORTS
+from . import saveDataFile, _  # for localized messages
+
+
+class TransferStats(object):
+	# throughput, queue depth, scan and plan durations and the ETA of the current run. Sampled on the reactor thread,
+	# the rates are smoothed per disk, so a single slow chunk doesnt jump the ETA and a degrading disk shows up as falling MB/s
+	SMOOTHING = 0.3  # weight of the newest sample
+	MAX_FINISHED = 20  # last finished jobs kept for the stats file
+	STATE_IDLE = "idle"
+	STATE_SCANNING = "scanning"
+	STATE_TRANSFERRING = "transferring"
+
+	def __init__(self, statsFile):
+		self.statsFile = statsFile
+		self.reset()
+
+	def reset(self):
+		self.state = self.STATE_IDLE
+		self.startTime = None
+		self.endTime = None
+		self.rate = 0.0  # bytes per second of all running transfers
+		self.diskRates = {}  # disk -> smoothed bytes per second
+		self.diskTotals = {}  # disk -> [bytes, seconds] of the finished jobs of this run
+		self.samples = {}  # running job -> (monotonic, transferred) of the last sample
+		self.jobStarts = {}  # running job -> (monotonic, transferred) at the start of the job
+		self.finished = deque(maxlen=self.MAX_FINISHED)
+		self.bytesDone = 0
+		self.filesDone = 0
+		self.filesFailed = 0
+		self.scanSeconds = None
+		self.planSeconds = None
+		self.dedupeSeconds = None
+		self.queueDepth = 0
+		self.remainingBytes = 0
+		self.eta = None
+
+	def startRun(self):
+		if self.state == self.STATE_IDLE:
+			self.reset()
+			self.startTime = monotonic()
+		self.endTime = None
+		self.state = self.STATE_SCANNING
+
+	def setScanTime(self, seconds):  # called by the WorkerPool
+		self.scanSeconds = seconds
+
+	def setPlanTime(self, seconds):  # called by the WorkerPool
+		self.planSeconds = seconds
+
+	def addDedupeTime(self, seconds):  # called by the WorkerPool, once per archive disk
+		self.dedupeSeconds = (self.dedupeSeconds or 0) + seconds
+
+	def jobStarted(self, job):
+		if self.startTime is None:  # jobs of the journal
+			self.startTime = monotonic()
+		self.endTime = None
+		self.state = self.STATE_TRANSFERRING
+		self.jobStarts[job] = self.samples[job] = (monotonic(), job.transferred)
+
+	def jobFinished(self, job):
+		start = self.jobStarts.pop(job, None)
+		self.samples.pop(job, None)
+		if start is None or job.paused:  # a paused job starts again with a new measurement
+			return
+		if job.error is not None:
+			self.filesFailed += 1
+			return
+		seconds = monotonic() - start[0]
+		transferred = job.transferred - start[1]
+		self.bytesDone += transferred
+		self.filesDone += len(job.getParts())
+		totals = self.diskTotals.setdefault(job.disk, [0, 0.0])
+		totals[0] += transferred
+		totals[1] += seconds
+		self.finished.append({"file": basename(job.sourceFile), "disk": job.disk, "bytes": transferred, "seconds": round(seconds, 1), "rate": int(transferred / seconds) if seconds > 0 else 0, "finished": int(time())})
+
+	def sample(self, runningJobs, queuedJobs):
+		# runningJobs: disk -> job. Updates the rates, the queue depth and the ETA
+		now = monotonic()
+		for disk, job in runningJobs.items():
+			last = self.samples.get(job)
+			if last is None:
+				continue
+			seconds = now - last[0]
+			if seconds > 0:
+				rate = max(0, job.transferred - last[1]) / seconds
+				oldRate = self.diskRates.get(disk)
+				self.diskRates[disk] = rate if oldRate is None else oldRate + self.SMOOTHING * (rate - oldRate)
+				self.samples[job] = (now, job.transferred)
+		self.rate = sum(rate for disk, rate in self.diskRates.items() if disk in runningJobs)
+		queuedJobs = list(queuedJobs)
+		self.queueDepth = len(queuedJobs) + len(runningJobs)
+		self.remainingBytes = sum(max(0, job.size - job.transferred) for job in list(runningJobs.values()) + queuedJobs)
+		self.eta = int(self.remainingBytes / self.rate) if self.rate > 0 else None
+
+	def stopRun(self):
+		self.state = self.STATE_IDLE
+		self.endTime = monotonic()
+		self.rate = 0.0
+		self.samples = {}
+		self.jobStarts = {}
+		self.queueDepth = 0
+		self.remainingBytes = 0
+		self.eta = None
+
+	def getSummary(self):
+		return {
+			"state": self.state,
+			"updated": int(time()),
+			"runSeconds": int((self.endTime or monotonic()) - self.startTime) if self.startTime is not None else 0,
+			"rate": int(self.rate),
+			"diskRates": dict((disk, int(rate)) for disk, rate in self.diskRates.items()),
+			"diskAverages": dict((disk, int(totals[0] / totals[1]) if totals[1] > 0 else 0) for disk, totals in self.diskTotals.items()),
+			"queueDepth": self.queueDepth,
+			"remainingBytes": self.remainingBytes,
+			"eta": self.eta,
+			"bytesDone": self.bytesDone,
+			"filesDone": self.filesDone,
+			"filesFailed": self.filesFailed,
+			"scanSeconds": round(self.scanSeconds, 2) if self.scanSeconds is not None else None,
+			"planSeconds": round(self.planSeconds, 2) if self.planSeconds is not None else None,
+			"dedupeSeconds": round(self.dedupeSeconds, 2) if self.dedupeSeconds is not None else None,
+			"finished": list(self.finished),
+		}
+
+	def getText(self):
+		# one line for the setup screen
+		if self.state == self.STATE_SCANNING:
+			return _("Scanning...")
+		if self.state == self.STATE_IDLE:
+			return ""
+		eta = "%d:%02d:%02d" % (self.eta // 3600, self.eta // 60 % 60, self.eta % 60) if self.eta is not None else "-"
+		return _("%.1f MB/s  Queue: %d  ETA: %s") % (self.rate / (1024 * 1024), self.queueDepth, eta)
+
+	def save(self):
+		saveDataFile(self.statsFile, dumps(self.getSummary(), separators=(",", ":")))  # readers never see a half written file
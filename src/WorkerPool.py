@@ -0,0 +1,75 @@
+###############################################################################
+#
+#    MovieArchiver
+#    Copyright (C) 2013 by svox
+#
+#    In case of reuse of this source code please do not remove this copyright.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    For more information on the GNU General Public License see:
+#    <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+
+
+# PYTHON IMPORTS
+from concurrent.futures import ThreadPoolExecutor
+from sys import exc_info, stdout
+from traceback import print_exception
+from twisted.internet import reactor
+
+# PLUGIN IMPORTS
+from . import printToConsole
+
+
+class WorkerPool(object):
+	# bounded thread pool for scanning, hashing and planning, so the gui thread never walks the disks.
+	# Callbacks and errbacks always run on the reactor (main) thread
+	instance = None
+	MAX_WORKERS = 2
+
+	def __init__(self, maxWorkers=MAX_WORKERS):
+		self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+
+	@staticmethod
+	def getInstance():
+		if WorkerPool.instance is None:
+			WorkerPool.instance = WorkerPool()
+		return WorkerPool.instance
+
+	def submit(self, function, args=(), callback=None, errback=None):
+		future = self.executor.submit(self.__run, function, args)
+		future.add_done_callback(lambda future: reactor.callFromThread(self.__finished, future, callback, errback))
+		return future
+
+	def shutdown(self):
+		self.executor.shutdown(wait=False)  # running tasks finish, their callbacks are still delivered
+		if WorkerPool.instance is self:
+			WorkerPool.instance = None
+
+	def __run(self, function, args):  # Private Methods
+		try:
+			return function(*args)
+		except Exception:
+			exc_type, exc_value, exc_traceback = exc_info()
+			print_exception(exc_type, exc_value, exc_traceback, file=stdout)
+			raise
+
+	def __finished(self, future, callback, errback):
+		error = future.exception()
+		if error is not None:
+			if errback is not None:
+				errback(error)
+			else:
+				printToConsole("[WorkerPool] %s" % str(error))
+		elif callback is not None:
+			callback(future.result())
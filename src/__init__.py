@@ -22,14 +22,19 @@
 
 # PYTHON IMPORTS
 from gettext import bindtextdomain, dgettext, gettext
+from os import fsync, makedirs, rename, unlink
+from os.path import exists, join
 
 # ENIGMA IMPORTS
-from Components.config import config, ConfigSubsection, ConfigNumber, ConfigText, ConfigYesNo, ConfigLocations
+from Components.config import config, ConfigSubsection, ConfigSubList, ConfigNumber, ConfigSelection, ConfigSelectionNumber, ConfigText, ConfigYesNo, ConfigLocations
 from Components.Language import language
-from Tools.Directories import resolveFilename, SCOPE_HDD, SCOPE_PLUGINS
+from Tools.Directories import resolveFilename, SCOPE_CONFIG, SCOPE_HDD, SCOPE_PLUGINS
 
 PluginLanguageDomain = "MovieArchiver"
 PluginLanguagePath = "Extensions/MovieArchiver/locale"
+PluginDataPath = resolveFilename(SCOPE_CONFIG, "MovieArchiver")  # index, journal and catalog files (flash)
+MaxAdditionalSources = 4
+MaxAdditionalTargets = 4
 
 
 def localeInit():
@@ -54,16 +59,44 @@ config.plugins.MovieArchiver.enabled = ConfigYesNo(default=False)
 config.plugins.MovieArchiver.backup = ConfigYesNo(default=False)
 config.plugins.MovieArchiver.skipDuringRecords = ConfigYesNo(default=True)
 config.plugins.MovieArchiver.showLimitReachedNotification = ConfigYesNo(default=True)
+config.plugins.MovieArchiver.batchSpinup = ConfigYesNo(default=False)  # collect finished records before the archive disk is woken up
+config.plugins.MovieArchiver.batchSize = ConfigNumber(default=10)  # GB of finished records which start a run
+config.plugins.MovieArchiver.batchMaxAge = ConfigNumber(default=24)  # hours, a finished record waits at most this long
+config.plugins.MovieArchiver.verifyTransfer = ConfigYesNo(default=False)
+config.plugins.MovieArchiver.dedupeArchive = ConfigYesNo(default=False)  # identical recordings on an archive disk are stored once (hardlinks)
+config.plugins.MovieArchiver.archiveRecursive = ConfigYesNo(default=False)  # archive the oldest movies of the movie folder incl. sub folders
+config.plugins.MovieArchiver.planStrategy = ConfigSelection(default="oldest", choices=[("oldest", _("oldest movies first")), ("fewest", _("fewest bytes over the limit")), ("coldest", _("coldest movies first"))])
 defaultDir = resolveFilename(SCOPE_HDD)  # default hdd
 if config.movielist.videodirs.getValue() and len(config.movielist.videodirs.getValue()) > 0:
 	defaultDir = config.movielist.videodirs.getValue()[0]
 config.plugins.MovieArchiver.sourcePath = ConfigText(default=defaultDir, fixed_size=False, visible_width=30)
 config.plugins.MovieArchiver.sourcePath.lastValue = config.plugins.MovieArchiver.sourcePath.getValue()
 config.plugins.MovieArchiver.sourceLimit = ConfigNumber(default=30)
+config.plugins.MovieArchiver.additionalSourceCount = ConfigSelectionNumber(0, MaxAdditionalSources, 1, default=0)  # more movie folders, used by archiving only
+config.plugins.MovieArchiver.additionalSources = ConfigSubList()
+videoDirs = config.movielist.videodirs.getValue() or []
+for i in range(MaxAdditionalSources):
+	additionalSource = ConfigSubsection()
+	additionalSource.path = ConfigText(default=videoDirs[i + 1] if len(videoDirs) > i + 1 else "", fixed_size=False, visible_width=30)  # the other recording locations
+	additionalSource.path.lastValue = additionalSource.path.getValue()
+	additionalSource.limit = ConfigNumber(default=30)
+	config.plugins.MovieArchiver.additionalSources.append(additionalSource)
 config.plugins.MovieArchiver.excludeDirs = ConfigLocations(visible_width=30)  # exclude folders
+config.plugins.MovieArchiver.keepLocalDirs = ConfigLocations(visible_width=30)  # movies in these folders are archived last (coldest movies first)
 config.plugins.MovieArchiver.targetPath = ConfigText(default=defaultDir, fixed_size=False, visible_width=30)
 config.plugins.MovieArchiver.targetPath.lastValue = config.plugins.MovieArchiver.targetPath.getValue()
 config.plugins.MovieArchiver.targetLimit = ConfigNumber(default=30)  # interval
+config.plugins.MovieArchiver.additionalTargetCount = ConfigSelectionNumber(0, MaxAdditionalTargets, 1, default=0)  # more archive disks, used by archiving only
+config.plugins.MovieArchiver.additionalTargets = ConfigSubList()
+for i in range(MaxAdditionalTargets):
+	additionalTarget = ConfigSubsection()
+	additionalTarget.path = ConfigText(default="", fixed_size=False, visible_width=30)
+	additionalTarget.path.lastValue = additionalTarget.path.getValue()
+	additionalTarget.limit = ConfigNumber(default=30)
+	config.plugins.MovieArchiver.additionalTargets.append(additionalTarget)
+config.plugins.MovieArchiver.bandwidthLimit = ConfigNumber(default=0)  # MB/s, 0 = unlimited
+config.plugins.MovieArchiver.recordBandwidthLimit = ConfigNumber(default=10)  # MB/s while a record is running, 0 = same as bandwidthLimit
+config.plugins.MovieArchiver.idleIoPriority = ConfigYesNo(default=True)
 
 # Helper Functions
 
@@ -76,6 +109,20 @@ def getSourcePathValue():
 	return getSourcePath().getValue()
 
 
+def getSourcePaths():
+	# config elements of the movie folder and the used additional movie folders
+	return [getSourcePath()] + [additionalSource.path for additionalSource in config.plugins.MovieArchiver.additionalSources[:config.plugins.MovieArchiver.additionalSourceCount.getValue()]]
+
+
+def getArchiveSources():
+	# (path, limit in GB) of all movie folders, the movie folder first
+	sources = [(getSourcePathValue(), config.plugins.MovieArchiver.sourceLimit.getValue())]
+	for additionalSource in config.plugins.MovieArchiver.additionalSources[:config.plugins.MovieArchiver.additionalSourceCount.getValue()]:
+		if additionalSource.path.getValue() and additionalSource.path.getValue() not in [path for path, limit in sources]:
+			sources.append((additionalSource.path.getValue(), additionalSource.limit.getValue()))
+	return sources
+
+
 def getTargetPath():
 	return config.plugins.MovieArchiver.targetPath
 
@@ -84,4 +131,42 @@ def getTargetPathValue():
 	return getTargetPath().getValue()
 
 
-__all__ = ['_', 'config', 'printToConsole', 'getSourcePath', 'getSourcePathValue', 'getTargetPath', 'getTargetPathValue']
+def getTargetPaths():
+	# config elements of the archive folder and the used additional archive folders
+	return [getTargetPath()] + [additionalTarget.path for additionalTarget in config.plugins.MovieArchiver.additionalTargets[:config.plugins.MovieArchiver.additionalTargetCount.getValue()]]
+
+
+def getArchiveTargets():
+	# (path, limit in GB) of all archive folders, the archive folder first
+	targets = [(getTargetPathValue(), config.plugins.MovieArchiver.targetLimit.getValue())]
+	for additionalTarget in config.plugins.MovieArchiver.additionalTargets[:config.plugins.MovieArchiver.additionalTargetCount.getValue()]:
+		if additionalTarget.path.getValue() and additionalTarget.path.getValue() not in [path for path, limit in targets]:
+			targets.append((additionalTarget.path.getValue(), additionalTarget.limit.getValue()))
+	return targets
+
+
+def getDataFile(fileName):
+	if not exists(PluginDataPath):
+		makedirs(PluginDataPath)
+	return join(PluginDataPath, fileName)
+
+
+def saveDataFile(fileName, content):
+	# atomic replace: content is written to a temp file, synced and renamed, so a crash or power loss keeps
+	# the old or the new file and never a half written one. Returns False if it could not be saved
+	tmpFile = "%s.tmp" % fileName
+	try:
+		with open(tmpFile, "w") as f:
+			f.write(content)
+			f.flush()
+			fsync(f.fileno())
+		rename(tmpFile, fileName)
+		return True
+	except (IOError, OSError) as e:
+		printToConsole("can't save '%s': %s" % (fileName, str(e)))
+		if exists(tmpFile):
+			unlink(tmpFile)
+		return False
+
+
+__all__ = ['_', 'config', 'printToConsole', 'getSourcePath', 'getSourcePathValue', 'getSourcePaths', 'getArchiveSources', 'getTargetPath', 'getTargetPathValue', 'getTargetPaths', 'getArchiveTargets', 'getDataFile', 'saveDataFile']
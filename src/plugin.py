@@ -21,45 +21,78 @@
 ###############################################################################
 
 # PYTHON IMPORTS
-from collections import deque
-from os import makedirs, listdir, walk, access, stat, statvfs, W_OK
-from os.path import getmtime, join, basename, isfile, isdir, ismount, islink, realpath, dirname, realpath, exists, splitext, getsize
-from shlex import quote
-from six import iteritems
+from concurrent.futures import ThreadPoolExecutor
+from heapq import nlargest, nsmallest
+from os import makedirs, listdir, statvfs, unlink
+from os.path import join, basename, isdir, islink, dirname, exists, relpath, normpath
 from sys import exc_info, stdout
-from time import time
+from threading import current_thread, main_thread
+from time import localtime, monotonic, strftime, time
 from traceback import print_exception
-from twisted.internet.reactor import callInThread
+from twisted.internet import reactor
 
 # ENIGMA IMPORTS
-from enigma import getDesktop, eConsoleAppContainer, eTimer
+from enigma import eServiceReference, getDesktop, eTimer
 from Components.ActionMap import ActionMap
 from Components.config import config, configfile, getConfigListEntry
 from Components.ConfigList import ConfigListScreen
 from Components.FileList import MultiFileSelectList
+from Components.MenuList import MenuList
 from Components.Sources.StaticText import StaticText
+from Screens.InfoBar import MoviePlayer
 from Screens.LocationBox import MovieLocationBox
 from Screens.MessageBox import MessageBox
 from Plugins.Plugin import PluginDescriptor
 from Screens.Screen import Screen
+from Screens.VirtualKeyBoard import VirtualKeyBoard
+from ServiceReference import ServiceReference
 from Screens.MessageBox import MessageBox
 from Tools import Notifications
 import NavigationInstance
 
 # PLUGIN IMPORTS
-from . import printToConsole, getSourcePathValue, getTargetPathValue, getSourcePath, getTargetPath, _  # for localized messages
+from . import printToConsole, getSourcePathValue, getTargetPathValue, getSourcePath, getTargetPath, getTargetPaths, getArchiveTargets, getSourcePaths, getArchiveSources, _  # for localized messages
+from .ArchiveCatalog import ArchiveCatalog
+from .ColdnessScorer import ColdnessScorer
+from .Deduplicator import Deduplicator
+from .ChecksumCatalog import ChecksumCatalog
+from .FileIndex import ExcludeFilter, FileIndex
+from .FileScanner import FileRecord, compareTrees, getBundleNames, getBundleRecords, listFileNames, scanFiles, statFile
+from .FileTransfer import BundleJob, FileTransfer, TokenBucket, TransferCancelled, TransferJob, TransferPaused
+from .JobJournal import JobJournal
+from .JobQueue import JobQueue
+from .MountCache import MountCache
+from .SpacePlanner import ArchivePlan, PlanItem, SpacePlanner
+from .SpinupBatcher import SpinupBatcher
+from .Fingerprint import FingerprintCache
+from .TransferStats import TransferStats
+from .WorkerPool import WorkerPool
 
 
 class MAglobals():
 	HANDLER = []
 	NOTIFICATIONCONTROLLER = None
-	MAX_TRIES = 50  # max tries (movies to move) after startArchiving recursion will end
+	MAX_PLAN_CANDIDATES = 200  # oldest movies the space planner chooses from
+	MAX_PARALLEL_TRANSFERS = 4  # transfers to different archive disks run in parallel
+	MAX_READERS_PER_DISK = 2  # parallel transfers reading from the same source disk
+	MAX_SCAN_THREADS = 4  # movie folders are scanned in parallel
 	INFO_MSG = "showAlert"  # show message window: body is msg, timeout
 	QUEUE_FINISHED = "queueFinished"
 	SECONDS_NEXT_RECORD = 600  # if in 10 mins (=600 secs) a record starts, dont archive movies
+	RECORD_FINISHED_DELAY = 10000  # ms, record finished events within this time start one archive run
+	RESUME_DELAY = 60  # secs after startup until unfinished jobs of the journal are continued (hdds are mounted)
+	RECORD_CHECK_INTERVAL = 5000  # ms, check for running records: adjust the bandwidth limit, pause or resume the queue
 	MOVIE_EXTENSION_TO_ARCHIVE = (".ts", ".avi", ".mkv", ".mp4", ".iso")  # file extension to archive or backup
 	DEFAULT_EXCLUDED_DIRNAMES = [".Trash", "trashcan"]
 	RECORD_FINISHED = "recordFinished"
+	RECORD_STARTED = "recordStarted"
+	BACKUP_BATCH_SIZE = 50  # new or changed files which are queued together while the backup scan is running
+	INDEX_MAX_AGE = 86400  # rescan the archive folder once a day, between the scans the index is updated by the plugin itself
+	STATS_INTERVAL = 5000  # ms, sample the transfer rates and write the stats file while archiving
+	STATS_FILE = "/tmp/MovieArchiver.stats.json"  # for OpenWebif and monitoring scripts, on tmpfs because it is written every few seconds
+	RESTORE_PREFETCH_SECONDS = 300  # a restored movie can be played when its first minutes and the sidecar files are copied
+	RESTORE_DEFAULT_BITRATE = 1024 * 1024  # bytes per second if the duration of the movie is unknown
+	SMALL_FILE_SIZE = 1024 * 1024  # changed files up to this size (cuts, meta, eit) are rewritten in place instead of copied
 
 
 maglobals = MAglobals()
@@ -82,6 +115,9 @@ class MAhelper():
 				maglobals.HANDLER.remove(e)
 
 	def dispatchEvent(self, eventType, *arg):
+		if current_thread() is not main_thread():  # listeners always run on the reactor thread
+			reactor.callFromThread(self.dispatchEvent, eventType, *arg)
+			return
 		for e in maglobals.HANDLER:
 			if e[0] == eventType:
 				if (arg is not None and len(arg) > 0):
@@ -90,53 +126,24 @@ class MAhelper():
 					e[1]()
 
 	def getOldestFile(self, mediapath, fileExtensions=None):
-		files = self.getFilesFromPath(mediapath)  # get oldest file from folder fileExtensions as tuple. example: ('.txt', '.png')
-		if files:
-			files = self.__filterFileListByFileExtension(files, fileExtensions)
-			return min(files, key=getmtime) if files else None  # oldestFile
+		records = self.getFiles(mediapath, fileExtensions)  # get oldest file record from folder fileExtensions as tuple. example: ('.txt', '.png')
+		return records[0] if records else None  # oldestFile
 
 	def getFiles(self, mediapath, fileExtensions=None):
-		files = self.getFilesFromPath(mediapath)  # get file list as an array	sorted by date.	The oldest first fileExtensions as tuple. example: ('.txt', '.png')
-		if not files:
-			files = self.__filterFileListByFileExtension(files, fileExtensions)
-			if files:
-				files.sort(key=lambda s: getmtime(join(mediapath, s)))
-		return files
+		# get file records (path, size, mtime from a single stat) sorted by date. The oldest first fileExtensions as tuple. example: ('.txt', '.png')
+		return sorted(scanFiles(mediapath, fileExtensions), key=lambda record: record.mtime)
 
 	def getFilesFromPath(self, mediapath):
 		return [join(mediapath, fname) for fname in listdir(mediapath)]
 
-	def getFilesWithNameKey(self, mediapath, excludedDirNames=None, excludeDirs=None):
-		rs = {}  # get recursive all files from given path
-		for dirPath, dirNames, fileNames in walk(mediapath):
-			for fileName in fileNames:
-				if excludedDirNames is not None and basename(dirPath) in excludedDirNames:  # skip, if dirname is found in excludedDirNames
-					continue
-				fullFilePath = join(dirPath, fileName)
-				skipFile = False
-				pathToCheck = dirPath if dirPath.endswith("/") else f"{dirPath}/"
-				if excludeDirs is not None:  # skip, if path found in excludeDirs
-					for excludeDir in excludeDirs:
-						if pathToCheck[:len(excludeDir)] == excludeDir:
-							skipFile = True
-							break
-				if skipFile == True:
-					continue
-				rs[join(dirPath.replace(mediapath, ""), fileName)] = fullFilePath
-		return rs
-
 	def pathIsWriteable(self, mediapath):
-		if isfile(mediapath):
-			mediapath = dirname(mediapath)
-		return True if isdir(mediapath) and self.ismounted(mediapath) and access(mediapath, W_OK) else False
+		return MountCache.getInstance().isWriteable(mediapath)  # cached until the mount table changes
 
 	def ismounted(self, mediapath):
 		return isdir(self.mountpoint(mediapath))
 
-	def mountpoint(self, mediapath, first=True):
-		if first:
-			mediapath = realpath(mediapath)
-		return mediapath if ismount(mediapath) or len(mediapath) == 0 else self.mountpoint(dirname(mediapath), False)
+	def mountpoint(self, mediapath):
+		return MountCache.getInstance().getMountpoint(mediapath)
 
 	def removeSymbolicLinks(self, pathList):
 		tmpExcludedDirs = []
@@ -160,19 +167,17 @@ class MAhelper():
 		free = self.getFreeDiskspace(mediapath)
 		return True if limit > (free // 1024) else False  # GB
 
-	def checkReachedLimitIfMoveFile(self, mediapath, limit, moviesFileSize):
-		freeDiskSpace = self.getFreeDiskspace(mediapath)
-		return True if (freeDiskSpace + moviesFileSize) >= limit * 1024 else False
+	def getServiceName(self, serviceRef):
+		try:
+			return ServiceReference(serviceRef).getServiceName() if serviceRef else ""
+		except Exception:
+			return ""
 
 	def getFileHash(self, file):
-		# factor, if size is higher, it is faster but need more ram sizeToSkip 104857600 = 100mb
-		# currently, we check only the fileSize because opening files and creating hash are to slow
-		return str(stat(file).st_size)
-
-	def __filterFileListByFileExtension(self, files, fileExtensions):  # Private Methods
-		# fileExtensions as tuple. example: ('.txt', '.png')
-		# files = filter(lambda s: s.endswith(fileExtension), files)
-		files = filter(lambda s: s.lower().endswith(fileExtensions), files) if fileExtensions is not None else files
+		# hashing whole recordings is to slow, the fingerprint only reads a few blocks and is cached by inode, size and mtime
+		if isinstance(file, FileRecord):  # no stat needed
+			return FingerprintCache.getInstance().getFingerprint(file.path, file.device, file.inode, file.size, file.mtime)
+		return FingerprintCache.getInstance().getFingerprint(file)
 
 
 class RecordNotification(MAhelper):
@@ -217,13 +222,12 @@ class RecordNotification(MAhelper):
 	def __onRecordEvent(self, timer):
 		if timer.justplay:
 			pass
-		elif timer.state == timer.StatePrepared:
-			pass
-		elif timer.state == timer.StateRunning:
-			pass
+		elif timer.state == timer.StatePrepared or timer.state == timer.StateRunning:
+			printToConsole("[RecordNotification] record start!")
+			self.dispatchEvent(maglobals.RECORD_STARTED)
 		elif timer.state == timer.StateEnded or timer.repeated and timer.state == timer.StateWaiting:  # Finished repeating timer will report the state StateEnded+1 or StateWaiting
 			printToConsole("[RecordNotification] record end!")
-			self.dispatchEvent(maglobals.RECORD_FINISHED)  # del timer
+			self.dispatchEvent(maglobals.RECORD_FINISHED, getattr(timer, "Filename", None))  # base name of the record files
 
 
 class NotificationController(MAhelper, object):  # classdocs
@@ -234,6 +238,13 @@ class NotificationController(MAhelper, object):  # classdocs
 		self.showUIMessage = None
 		self.movieManager = MovieManager()
 		self.recordNotification = RecordNotification()
+		self.resumeTimer = eTimer()
+		self.resumeTimer.callback.append(self.__resumeJobs)
+		self.recordFinishedTimer = eTimer()
+		self.recordFinishedTimer.callback.append(self.__archiveRecordings)
+		self.batcher = SpinupBatcher()
+		self.batchTimer = eTimer()  # max age of the collected records
+		self.batchTimer.callback.append(self.__archiveRecordings)
 
 	@staticmethod
 	def getInstance():
@@ -251,9 +262,12 @@ class NotificationController(MAhelper, object):  # classdocs
 		if config.plugins.MovieArchiver.enabled.value and self.recordNotification.isActive() == False:
 			self.addEventListener(maglobals.RECORD_FINISHED, self.__recordFinishedHandler)
 			self.recordNotification.startTimer()
+			self.__startBatchTimer()  # records collected before the restart
 
 	def stop(self):
 		self.removeEventListener(maglobals.RECORD_FINISHED, self.__recordFinishedHandler)
+		self.recordFinishedTimer.stop()
+		self.batchTimer.stop()
 		self.recordNotification.stopTimer()
 
 	def startArchiving(self, showUIMessage=False):
@@ -263,7 +277,11 @@ class NotificationController(MAhelper, object):  # classdocs
 		else:
 			self.removeEventListener(maglobals.QUEUE_FINISHED, self.__queueFinishedHandler)
 		self.addEventListener(maglobals.INFO_MSG, self.__infoMsgHandler)
-		self.movieManager.startArchiving()
+		self.recordNotification.startTimer()  # record events pause the queue, also if archiving is started manually
+		self.__runStarted(self.movieManager.startArchiving(JobQueue.PRIORITY_MANUAL if showUIMessage else JobQueue.PRIORITY_AUTO))
+
+	def resumeJobs(self):
+		self.resumeTimer.startLongTimer(maglobals.RESUME_DELAY)
 
 	def stopArchiving(self):
 		self.movieManager.stopArchiving()
@@ -272,15 +290,70 @@ class NotificationController(MAhelper, object):  # classdocs
 	def isArchiving(self):
 		return self.movieManager.running()  # returns true if currently archiving or backup is running
 
+	def getPlan(self):
+		return self.movieManager.getPlan()  # ArchivePlan of the last archive run or None
+
+	def getStats(self):
+		return self.movieManager.getStats()  # TransferStats of the current or last run
+
+	def getProgress(self):
+		return self.movieManager.getProgress()  # (bytes transferred, bytes total) of the running transfers
+
+	def getCatalog(self):
+		return self.movieManager.getCatalog()  # ArchiveCatalog of the archived recordings
+
+	def restoreMovie(self, moviePath):
+		self.addEventListener(maglobals.INFO_MSG, self.__infoMsgHandler)
+		self.recordNotification.startTimer()
+		self.movieManager.restoreMovie(moviePath)
+
 	def showMessage(self, msg, timeout=10):
 		if self.view is not None:
 			self.view.session.open(MessageBox, msg, MessageBox.TYPE_INFO, timeout)
 		else:
 			Notifications.AddNotification(MessageBox, msg, type=MessageBox.TYPE_INFO, timeout=timeout)
 
-	def __recordFinishedHandler(self):  # Private Methods
+	def __resumeJobs(self):  # Private Methods
+		self.addEventListener(maglobals.INFO_MSG, self.__infoMsgHandler)
+		self.recordNotification.startTimer()
+		self.movieManager.resumeJobs()
+
+	def __recordFinishedHandler(self, recordName=None):
 		printToConsole("recordFinished")
-		self.startArchiving()
+		if config.plugins.MovieArchiver.batchSpinup.getValue():
+			self.batcher.add(recordName + ".ts" if recordName else None)
+		self.recordFinishedTimer.start(maglobals.RECORD_FINISHED_DELAY, True)  # restarted by every event of a burst
+
+	def __archiveRecordings(self):
+		if self.isArchiving():  # new jobs are merged into the running queue, dont touch the ui state of the run
+			self.__runStarted(self.movieManager.startArchiving())
+		elif not config.plugins.MovieArchiver.batchSpinup.getValue() or self.__isBatchDue():
+			self.startArchiving()
+		else:  # the archive disk keeps sleeping
+			printToConsole("collected records: %d MB, archive disk is woken up at %d GB or in %d min" % (self.batcher.getPendingBytes() // 1024 // 1024, config.plugins.MovieArchiver.batchSize.getValue(), self.batcher.getTimeLeft(self.__getBatchMaxAge()) // 60))
+			self.__startBatchTimer()
+
+	def __isBatchDue(self):
+		if self.batcher.isDue(config.plugins.MovieArchiver.batchSize.getValue() * 1024 ** 3, self.__getBatchMaxAge()):
+			return True
+		# a movie disk which can't hold another batch is archived at once. Only the movie disks are asked, they are awake
+		batchSize = config.plugins.MovieArchiver.batchSize.getValue() * 1024  # MB
+		return not config.plugins.MovieArchiver.backup.getValue() and any(self.movieManager.getFreeDiskspace(path) < batchSize for path, limit in self.movieManager.getArchiveSources())
+
+	def __getBatchMaxAge(self):
+		return config.plugins.MovieArchiver.batchMaxAge.getValue() * 3600
+
+	def __startBatchTimer(self):
+		timeLeft = self.batcher.getTimeLeft(self.__getBatchMaxAge())
+		if timeLeft is not None and config.plugins.MovieArchiver.batchSpinup.getValue():
+			self.batchTimer.startLongTimer(max(1, timeLeft))
+
+	def __runStarted(self, started):
+		if started:  # the run picks up the collected records
+			self.batchTimer.stop()
+			self.batcher.clear()
+		elif self.batcher.getTimeLeft(self.__getBatchMaxAge()):  # skipped, the records stay collected. A due batch waits for the next record event
+			self.__startBatchTimer()
 
 	def __queueFinishedHandler(self, hasArchiveMovies):
 		if hasArchiveMovies == True:
@@ -297,145 +370,661 @@ class NotificationController(MAhelper, object):  # classdocs
 
 class MovieManager(MAhelper, object):  # classdocs
 	def __init__(self):  # Constructor
-		self.execCommand = ""
-		self.executionQueueList = deque()
-		self.executionQueueListInProgress = False
-		self.console = eConsoleAppContainer()
-		self.console.appClosed.append(self.__runFinished)
+		self.runningJobs = {}  # physical disk of the target -> running job, one transfer per disk
+		self.lastPlan = None
+		self.executionQueue = JobQueue()
+		self.executionQueueInProgress = False
+		self.planning = False  # scan and plan of the current run are in the WorkerPool
+		self.planBusy = False  # the WorkerPool scans, also after the run was stopped
+		self.planGeneration = 0  # incremented by stopArchiving, results of older runs are dropped
+		self.replanPriority = None  # run requested while the WorkerPool was busy
+		self.pendingIndexUpdates = []  # target index updates while the WorkerPool uses the index
+		self.fileIndexes = {}
+		self.excludeFilters = {}
+		self.checksumCatalog = ChecksumCatalog()
+		self.archiveCatalog = ArchiveCatalog()
+		self.journal = JobJournal()
+		self.bandwidth = TokenBucket()  # shared by the transfers of all disks, the limit is for the whole archiver
+		self.deduplicator = Deduplicator(self.checksumCatalog, self.bandwidth)
+		self.fileTransfers = {}  # disk -> FileTransfer
+		self.paused = False
+		self.recordCheckTimer = eTimer()
+		self.recordCheckTimer.callback.append(self.__checkRecordings)
+		self.stats = TransferStats(maglobals.STATS_FILE)
+		self.statsTimer = eTimer()
+		self.statsTimer.callback.append(self.__updateStats)
 
 	def running(self):
-		return self.executionQueueListInProgress
+		return self.executionQueueInProgress or self.planning
+
+	def isPaused(self):
+		return self.paused
+
+	def pauseQueue(self):
+		if self.running() and not self.paused:  # the running transfer stops at the next chunk and keeps its partial file
+			printToConsole("pause queue")
+			self.paused = True
+			for fileTransfer in self.fileTransfers.values():
+				fileTransfer.pause()
+
+	def resumeQueue(self):
+		if self.paused:
+			printToConsole("resume queue")
+			self.paused = False
+			for fileTransfer in self.fileTransfers.values():
+				fileTransfer.resume()
+			self.execQueue()
+
+	def resumeJobs(self):
+		# continue the jobs of the journal which were not done before the last restart or crash
+		if self.running():
+			return
+		for entry in self.journal.getUnfinished():
+			if "files" in entry:  # recording bundle
+				job = BundleJob([TransferJob(sourceFile, targetFile, entry["mode"]) for sourceFile, targetFile in entry["files"]], entry["verify"], entry.get("priority", JobQueue.PRIORITY_AUTO))
+			else:
+				job = TransferJob(entry["source"], entry["target"], entry["mode"], entry["relPath"], entry["verify"], entry.get("priority", JobQueue.PRIORITY_AUTO))
+			job.jobId = entry["id"]
+			if not exists(job.sourceFile):  # moved meanwhile or done before the journal was written
+				if job.mode == TransferJob.MODE_STREAM:  # restore, its partial movie is written in place
+					if not exists(dirname(job.sourceFile)):  # archive disk not mounted, kept in the journal for the next start
+						continue
+					self.__removePartFiles(job)
+				self.journal.update(job, JobJournal.STATE_DONE)
+				continue
+			job.transferred = entry["offset"]  # last synced offset, the part file is truncated to it (bundles: sum of all files)
+			self.executionQueue.add(job)
+		if len(self.executionQueue) > 0:
+			self.dispatchEvent(maglobals.INFO_MSG, _("Continue archiving."), 5)
+			self.execQueue()
+		else:
+			self.journal.compact()
+
+	def getProgress(self):
+		jobs = list(self.runningJobs.values())  # (bytes transferred, bytes total) of the running transfers
+		return (sum(job.transferred for job in jobs), sum(job.size for job in jobs))
+
+	def startArchiving(self, priority=JobQueue.PRIORITY_AUTO):
+		# a running queue is not restarted, the new jobs are merged into it. False if the run was skipped
+		if self.planBusy:  # one scan at a time, started again when the running one is finished
+			self.replanPriority = priority if self.replanPriority is None else min(priority, self.replanPriority)
+			return True
 
-	def startArchiving(self):
 		if self.mountpoint(getSourcePathValue()) == self.mountpoint(getTargetPathValue()):
 			self.dispatchEvent(maglobals.INFO_MSG, _("Stop archiving!\nCan't archive movies to the same hard drive!!\nPlease change the paths in the MovieArchiver settings."), 10)
-			return
+			return False
 
 		if config.plugins.MovieArchiver.skipDuringRecords.getValue() and self.isRecordingStartInNextTime():
 			self.dispatchEvent(maglobals.INFO_MSG, _("Skip archiving!\nA record is running or start in the next minutes."), 10)
-			return
+			return False
 
-		if self.reachedLimit(getTargetPathValue(), config.plugins.MovieArchiver.targetLimit.getValue()):
+		targets = [(getTargetPathValue(), config.plugins.MovieArchiver.targetLimit.getValue())] if config.plugins.MovieArchiver.backup.getValue() else getArchiveTargets()
+		if all(self.reachedLimit(path, limit) for path, limit in targets):
 			msg = _("Stop archiving!\nCan't archive movie because archive-harddisk limit reached!")
 			printToConsole(msg)
 			if config.plugins.MovieArchiver.showLimitReachedNotification.getValue():
 				self.dispatchEvent(maglobals.INFO_MSG, msg, 20)
-			return
+			return False
 
 		if config.plugins.MovieArchiver.backup.getValue():
-			self.backupFiles(getSourcePathValue(), getTargetPathValue())
-		else:
-			self.archiveMovies()
+			return self.backupFiles(getSourcePathValue(), getTargetPathValue(), priority)
+		return self.archiveMovies(priority)
 
 	def stopArchiving(self):
-		if self.running():  # current move or copy process doesnt canceled.	only queue is cleared
+		if self.running():  # current move or copy process is cancelled at the next chunk, the partial target file is removed
+			self.planning = False
+			self.planGeneration += 1
+			self.replanPriority = None
+			for job in self.runningJobs.values():
+				job.cancel()
 			self.__clearExecutionQueueList()
 
-	def archiveMovies(self):
-		tries = 0  # archiving movies
-		moviesFileSize = 0
-		if self.reachedLimit(getSourcePathValue(), config.plugins.MovieArchiver.sourceLimit.getValue()):
-			files = self.getFiles(getSourcePathValue(), maglobals.MOVIE_EXTENSION_TO_ARCHIVE)
-			if files:
-				for file in files:
-					moviesFileSize += getsize(file) // 1024 // 1024
-					# Source Disk: check if its enough that we move only this file
-					breakMoveNext = self.checkReachedLimitIfMoveFile(getSourcePathValue(), config.plugins.MovieArchiver.sourceLimit.getValue(), moviesFileSize)
-					self.addMovieToArchiveQueue(file)
-					if breakMoveNext or tries > maglobals.MAX_TRIES:
-						break
-					# Target Disk: check if limit is reached if we move this file
-					breakMoveNext = self.checkReachedLimitIfMoveFile(getTargetPathValue(), config.plugins.MovieArchiver.targetLimit.getValue(), moviesFileSize)
-					if breakMoveNext == False:
-						break
-					tries += 1
-				self.dispatchEvent(maglobals.INFO_MSG, _("Start archiving."), 5)
-				self.execQueue()
+	def archiveMovies(self, priority=JobQueue.PRIORITY_AUTO):
+		sources = self.getArchiveSources()
+		if any(self.reachedLimit(path, limit) for path, limit in sources):  # archiving movies
+			targets = self.getArchiveTargets()  # checked once, not for every queued movie
+			if len(targets) == 0:
+				self.dispatchEvent(maglobals.INFO_MSG, _("Archive Folder is not writable.\nPlease check the permission."), 10)
+				return False
+			self.__runPlanning(self.planArchiving, (targets, sources), lambda plan: self.__queuePlan(plan, priority))
 		else:
 			self.dispatchEvent(maglobals.INFO_MSG, _("limit not reached. Wait for next Event."), 5)
-
-	def backupFiles(self, sourcePath, targetPath):
+		return True  # also if the limit is not reached, there is nothing to archive
+
+	def restoreMovie(self, moviePath, priority=JobQueue.PRIORITY_MANUAL):
+		# copy an archived recording back to the movie folder. Checked in the WorkerPool, the archive disk may have to spin up first
+		restoring = sum(max(0, job.size - job.transferred) for job in list(self.executionQueue) + list(self.runningJobs.values()) if job.mode == TransferJob.MODE_STREAM)
+		WorkerPool.getInstance().submit(self.planRestore, (moviePath, restoring), lambda result: self.__queueRestore(result, priority))
+
+	def planRestore(self, moviePath, plannedBytes=0):  # runs in the WorkerPool
+		# (records, targetFolder) of the bundle to restore, or (None, message) if it can't be restored
+		targetRoot = next((path for path, limit in getArchiveTargets() if moviePath.startswith(join(path, ""))), None)
+		if targetRoot is None:
+			return (None, _("The movie is not in an archive folder."))
+		records = getBundleRecords(moviePath)
+		if not records or records[0].path != moviePath:
+			return (None, _("The movie was not found in the archive folder."))
+		sourcePath = getSourcePathValue()
+		targetFolder = normpath(join(sourcePath, relpath(dirname(moviePath), targetRoot)))  # mirrored like the archive
+		if exists(join(targetFolder, basename(moviePath))):
+			return (None, _("The movie is already in the movie folder."))
+		if SpacePlanner().planRestore(self.getArchiveSources(), sourcePath, sum(record.size for record in records), plannedBytes) is None:
+			return (None, _("Not enough space in the movie folder.\nThe restore would cross its limit."))
+		return (records, targetFolder)
+
+	def getArchiveSources(self):
+		# (path, limit) of the existing movie folders
+		return [(path, limit) for path, limit in getArchiveSources() if isdir(path)]
+
+	def getArchiveTargets(self):
+		# (path, limit) of the writable archive folders which are not on a movie disk. Several folders on
+		# one filesystem would share their free space, only the first one is used
+		sourceMountpoints = set(self.mountpoint(path) for path, limit in getArchiveSources())
+		targets = []
+		mountpoints = set()
+		for path, limit in getArchiveTargets():
+			mountpoint = self.mountpoint(path)
+			if mountpoint in sourceMountpoints or mountpoint in mountpoints or not self.pathIsWriteable(path):
+				printToConsole("skip archive folder '%s'" % path)
+				continue
+			mountpoints.add(mountpoint)
+			targets.append((path, limit))
+		return targets
+
+	def planArchiving(self, targets=None, sources=None):  # runs in the WorkerPool
+		# the movie folders are scanned in parallel, then one statvfs per disk and the movies to move are chosen
+		# in one oldest (or coldest) first pass over all folders and spread over the archive disks. No transfer is started here
+		if targets is None:
+			targets = self.getArchiveTargets()
+		if sources is None:
+			sources = self.getArchiveSources()
+		recursive = config.plugins.MovieArchiver.archiveRecursive.getValue()
+		excludeDirs = config.plugins.MovieArchiver.excludeDirs.getValue() + [path for path, limit in targets]
+		sourcePaths = [path for path, limit in sources]
+		strategy = config.plugins.MovieArchiver.planStrategy.getValue()
+		scorer = ColdnessScorer(keepLocalDirs=config.plugins.MovieArchiver.keepLocalDirs.getValue()) if strategy == ArchivePlan.STRATEGY_COLDEST else None
+
+		def scanSource(sourcePath):  # runs in a thread of the pool
+			excludeFilter = self.getExcludeFilter(excludeDirs + [path for path in sourcePaths if path != sourcePath]) if recursive else None  # other movie folders are scanned by their own thread
+			if scorer is not None:
+				return self.getColdestMovies(sourcePath, maglobals.MAX_PLAN_CANDIDATES, scorer, recursive, excludeFilter)
+			return [(None, record) for record in self.getOldestMovies(sourcePath, maglobals.MAX_PLAN_CANDIDATES, recursive, excludeFilter)]
+
+		scanStart = monotonic()
+		if len(sourcePaths) > 1:
+			with ThreadPoolExecutor(max_workers=min(len(sourcePaths), maglobals.MAX_SCAN_THREADS)) as pool:
+				sourceFiles = list(pool.map(scanSource, sourcePaths))
+		else:
+			sourceFiles = [scanSource(sourcePath) for sourcePath in sourcePaths]
+		self.stats.setScanTime(monotonic() - scanStart)
+		if config.plugins.MovieArchiver.dedupeArchive.getValue():  # before the free space of the archive disks is read
+			self.dedupeTargets(targets)
+		planStart = monotonic()
+		dirNames = {}
+		candidates = [self.getPlanItems(files, sourcePath, dirNames) for sourcePath, files in zip(sourcePaths, sourceFiles)]
+		plan = SpacePlanner().plan(sources, targets, candidates, strategy)
+		self.stats.setPlanTime(monotonic() - planStart)
+		return plan
+
+	def dedupeTargets(self, targets):  # runs in the WorkerPool
+		# the indexes of the archive disks are refreshed (only changed folders are listed), then identical files are linked
+		for path, limit in targets:
+			targetIndex = self.getFileIndex(path)
+			targetIndex.refresh(self.getExcludeFilter(), statFiles=False)
+			self.dedupeIndex(targetIndex)
+
+	def dedupeIndex(self, targetIndex):  # runs in the WorkerPool
+		dedupeStart = monotonic()
+		freed = self.deduplicator.dedupe(targetIndex)
+		targetIndex.save()
+		self.stats.addDedupeTime(monotonic() - dedupeStart)
+		if freed > 0:
+			self.dispatchEvent(maglobals.INFO_MSG, _("%.1f GB freed on the archive harddisk by linking identical recordings.") % (freed / 1024.0 ** 3), 5)
+		return freed
+
+	def getPlan(self):
+		return self.lastPlan
+
+	def getStats(self):
+		return self.stats
+
+	def getCatalog(self):
+		return self.archiveCatalog
+
+	def getOldestMovies(self, mediapath, count, recursive=False, excludeFilter=None):
+		# bounded heap over the scanned movies, the tree is never sorted completely. Meta files are not stat'ed here
+		return nsmallest(count, scanFiles(mediapath, maglobals.MOVIE_EXTENSION_TO_ARCHIVE, recursive, excludeFilter), key=lambda record: record.mtime)
+
+	def getColdestMovies(self, mediapath, count, scorer, recursive=False, excludeFilter=None):
+		# (score, record) of the coldest movies, coldest first. Bounded heap like getOldestMovies, every movie is scored once
+		return nlargest(count, ((scorer.getScore(record), record) for record in scanFiles(mediapath, maglobals.MOVIE_EXTENSION_TO_ARCHIVE, recursive, excludeFilter)), key=lambda scored: scored[0])
+
+	def getPlanItems(self, files, sourcePath, dirNames):
+		for score, file in files:  # meta files are only looked up for movies the planner looks at
+			yield PlanItem(file, self.getMovieRecords(file, dirNames), sourcePath, score)
+
+	def getMovieRecords(self, movieRecord, dirNames):
+		# movie incl. meta files like .ts.cuts, .ts.meta and .eit. The movie record of the scan is reused and only the
+		# existing sidecar files are stat'ed, dirNames caches the file names per folder
+		folder = dirname(movieRecord.path)
+		if folder not in dirNames:
+			dirNames[folder] = listFileNames(folder)
+		names = dirNames[folder]
+		sidecarRecords = (statFile(path) for path in getBundleNames(movieRecord.path)[1:] if basename(path) in names)
+		return [movieRecord] + [record for record in sidecarRecords if record is not None]
+
+	def backupFiles(self, sourcePath, targetPath, priority=JobQueue.PRIORITY_AUTO):
 		if self.pathIsWriteable(targetPath) == False:  # sync files, check if target path is writable
 			self.dispatchEvent(maglobals.INFO_MSG, _("Backup Target Folder is not writable.\nPlease check the permission."), 10)
-			return
-		#check if some files to archive available
-		sourceFiles = self.getFilesWithNameKey(sourcePath, excludedDirNames=maglobals.DEFAULT_EXCLUDED_DIRNAMES, excludeDirs=config.plugins.MovieArchiver.excludeDirs.getValue())
-		if sourceFiles is None:
-			self.dispatchEvent(maglobals.INFO_MSG, _("No files for backup found."), 10)
-			return
+			return False
+		self.__runPlanning(self.getFilesToBackup, (sourcePath, targetPath, priority, self.planGeneration), lambda sourceFiles: self.__queueBackupFiles(sourceFiles, priority))
+		return True
+
+	def getFilesToBackup(self, sourcePath, targetPath, priority, generation):  # runs in the WorkerPool
+		# streams the new and changed files of the source. Every BACKUP_BATCH_SIZE files are queued on the
+		# reactor thread, so the first copies start while the tree is still compared. Returns the rest
+		scanStart = monotonic()
+		targetIndex = self.getFileIndex(targetPath)
+		if not targetIndex.isValid(maglobals.INDEX_MAX_AGE):  # only scan the archive disk if the index is missing or outdated
+			targetIndex.refresh(self.getExcludeFilter(), statFiles=False)
+			targetIndex.save()
+		scanSeconds = monotonic() - scanStart
+		if config.plugins.MovieArchiver.dedupeArchive.getValue():  # not counted as scan time
+			self.dedupeIndex(targetIndex)
+		scanStart = monotonic()
 		self.dispatchEvent(maglobals.INFO_MSG, _("Backup Archive. Synchronization started"), 5)
-		targetFiles = self.getFilesWithNameKey(targetPath, excludedDirNames=maglobals.DEFAULT_EXCLUDED_DIRNAMES)
-		for sFileName, sFile in iteritems(sourceFiles):  # determine movies to sync and add to queue
-			if sFileName not in targetFiles:
-				printToConsole("file is new. Add To Archive: " + sFile)
-				self.addFileToBackupQueue(sFile)
-			else:
-				tFile = targetFiles[sFileName]
-				if self.getFileHash(tFile) != self.getFileHash(sFile):
-					printToConsole("file is different. Add to Archive: " + sFile)
-					self.addFileToBackupQueue(sFile)
-		if len(self.executionQueueList) < 1:
-			self.dispatchEvent(maglobals.QUEUE_FINISHED, False)
-		else:
-			self.execQueue()
-
-	def addFileToBackupQueue(self, sourceFile):
-		targetPath = getTargetPathValue()
-		if isdir(targetPath) and dirname(sourceFile) != targetPath and self.pathIsWriteable(targetPath):
-			subFolderPath = sourceFile.replace(getSourcePathValue(), "")
+		sourceFiles = []
+		hasFiles = False
+		for relPath, sourceRecord, targetRecord in compareTrees(sourcePath, targetPath, self.getExcludeFilter(config.plugins.MovieArchiver.excludeDirs.getValue()), targetIndex):  # determine movies to sync
+			hasFiles = True
+			if generation != self.planGeneration:  # stopped
+				return None
+			if targetRecord is None:
+				printToConsole("file is new. Add To Archive: " + sourceRecord.path)
+				sourceFiles.append((sourceRecord.path, TransferJob.MODE_COPY, 0, sourceRecord.size))
+			elif self.isFileChanged(sourceRecord, targetRecord, targetIndex, relPath):
+				mode, offset = self.getBackupMode(sourceRecord, targetRecord, targetIndex, relPath)
+				printToConsole("file is different (%s from %d). Add to Archive: %s" % (mode, offset, sourceRecord.path))
+				sourceFiles.append((sourceRecord.path, mode, offset, sourceRecord.size))
+			if len(sourceFiles) >= maglobals.BACKUP_BATCH_SIZE:
+				reactor.callFromThread(self.__queueBackupBatch, sourceFiles, priority, generation)
+				sourceFiles = []
+		targetIndex.save()  # fingerprints of the archive files, they are not read again
+		self.stats.setScanTime(scanSeconds + monotonic() - scanStart)
+		if not hasFiles:
+			self.dispatchEvent(maglobals.INFO_MSG, _("No files for backup found."), 10)
+			return None
+		return sourceFiles
+
+	def getBackupMode(self, sourceRecord, targetRecord, targetIndex, relPath):
+		# (mode, offset) of a changed file. A grown recording whose old copy is still its prefix only gets the new
+		# tail appended, small files are rewritten in place, everything else is copied again
+		if sourceRecord.size <= maglobals.SMALL_FILE_SIZE and targetRecord.size <= maglobals.SMALL_FILE_SIZE:
+			return (TransferJob.MODE_REWRITE, 0)
+		if 0 < targetRecord.size < sourceRecord.size:
+			try:
+				if FingerprintCache.getInstance().getPrefixFingerprint(sourceRecord.path, targetRecord.size) == self.getTargetHash(targetRecord, targetIndex, relPath):
+					return (TransferJob.MODE_APPEND, targetRecord.size)
+			except OSError:
+				pass
+		return (TransferJob.MODE_COPY, 0)
+
+	def addFileToBackupQueue(self, sourceFile, priority=JobQueue.PRIORITY_AUTO, mode=TransferJob.MODE_COPY, offset=0, size=0):
+		targetPath = getTargetPathValue()  # writable check of the target is done once by backupFiles
+		if dirname(sourceFile) != targetPath:
+			subFolderPath = relpath(sourceFile, getSourcePathValue())
 			targetPathWithSubFolder = join(targetPath, subFolderPath)
-			newExecCommand = 'cp "' + sourceFile + '" "' + targetPathWithSubFolder + '"'
 			folder = dirname(targetPathWithSubFolder)  # create folders if doesnt exists
 			if exists(folder) == False:
 				makedirs(folder)
-			self.__addExecCommandToArchiveQueue(newExecCommand)
+			job = TransferJob(sourceFile, targetPathWithSubFolder, mode, subFolderPath, config.plugins.MovieArchiver.verifyTransfer.getValue(), priority)
+			job.transferred = offset  # appends start at the end of the old copy
+			job.size = size  # for the ETA, the transfer stats the file again
+			self.__addJobToQueue(job)
+
+	def addMovieToArchiveQueue(self, sourceMovie, relatedRecords=None, targetPath=None, priority=JobQueue.PRIORITY_AUTO, sourcePath=None):
+		targetPath = targetPath or getTargetPathValue()  # writable check of the target is done once by archiveMovies
+		sourcePath = sourcePath or getSourcePathValue()
+		if dirname(sourceMovie) != targetPath:
+			records = getBundleRecords(sourceMovie, relatedRecords)  # movie incl. meta files like .ts.ap, .ts.cuts, .ts.meta and .eit
+			if not records:
+				return
+			targetFolder = normpath(join(targetPath, relpath(dirname(sourceMovie), sourcePath)))  # mirror the sub folders of the movie folder
+			if exists(targetFolder) == False:
+				makedirs(targetFolder)
+			parts = [TransferJob(record.path, join(targetFolder, basename(record.path)), TransferJob.MODE_MOVE) for record in records]
+			bundle = BundleJob(parts, config.plugins.MovieArchiver.verifyTransfer.getValue(), priority)  # moved as one transaction
+			bundle.size = sum(record.size for record in records)  # for the ETA
+			self.__addJobToQueue(bundle)
+
+	def isFileChanged(self, sourceRecord, targetRecord, targetIndex, relPath):
+		isDifferent = self.checksumCatalog.isDifferent(sourceRecord.path, sourceRecord.size, sourceRecord.mtime, targetRecord.path, targetRecord.size, targetRecord.mtime)
+		if isDifferent is not None:
+			return isDifferent
+		try:  # same size, compare sampled blocks (cached, unchanged files are not read)
+			return self.getFileHash(sourceRecord) != self.getTargetHash(targetRecord, targetIndex, relPath)
+		except OSError:
+			return True
 
-	def addMovieToArchiveQueue(self, sourceMovie):
-		targetPath = getTargetPathValue()
-		if isdir(targetPath) and dirname(sourceMovie) != targetPath and self.pathIsWriteable(targetPath):
-			fileNameWithoutExtension = splitext(sourceMovie)[0]
-			newExecCommand = 'mv "' + fileNameWithoutExtension + '."* "' + targetPath + '"'
-			self.__addExecCommandToArchiveQueue(newExecCommand)
+	def getTargetHash(self, targetRecord, targetIndex, relPath):
+		# fingerprints of the archive files are kept in their index entry, the archive disk is only read for new or changed files
+		fingerprint = targetIndex.getFingerprint(relPath)
+		if fingerprint is None:
+			fingerprint = FingerprintCache.getInstance().getFingerprint(targetRecord.path, targetRecord.device, targetRecord.inode, targetRecord.size, targetRecord.mtime, cache=False)
+			targetIndex.setFingerprint(relPath, fingerprint)
+		return fingerprint
+
+	def getExcludeFilter(self, excludeDirs=None):
+		key = tuple(excludeDirs or ())  # compiled once per exclude setting
+		if key not in self.excludeFilters:
+			self.excludeFilters[key] = ExcludeFilter(maglobals.DEFAULT_EXCLUDED_DIRNAMES, key)
+		return self.excludeFilters[key]
+
+	def getFileIndex(self, mediapath):
+		if mediapath not in self.fileIndexes:
+			self.fileIndexes[mediapath] = FileIndex(mediapath)
+		return self.fileIndexes[mediapath]
 
 	def execQueue(self):
 		try:
-			if len(self.executionQueueList) > 0:
-				self.executionQueueListInProgress = True
-				self.execCommand = self.executionQueueList.popleft()
-				callInThread(self.console.execute("sh -c " + self.execCommand))
-				printToConsole("execQueue: Move Movie '" + self.execCommand + "'")
+			if len(self.executionQueue) > 0:
+				if not self.executionQueueInProgress:
+					self.addEventListener(maglobals.RECORD_STARTED, self.__recordStarted)
+					self.addEventListener(maglobals.RECORD_FINISHED, self.__recordFinished)
+					self.recordCheckTimer.start(maglobals.RECORD_CHECK_INTERVAL)
+				self.executionQueueInProgress = True
+				if self.paused:  # continued by resumeQueue
+					return
+				self.updateBandwidthLimit()
+				while len(self.runningJobs) < maglobals.MAX_PARALLEL_TRANSFERS:  # one job per idle disk, in queue order
+					job = self.executionQueue.popNext(self.__isDiskIdle)
+					if job is None:
+						break
+					self.runningJobs[job.disk] = job
+					printToConsole("execQueue: %s on %s" % (job, job.disk))
+					self.stats.jobStarted(job)
+					self.__startStatsTimer()
+					reactor.callInThread(self.__runJob, job, self.__getFileTransfer(job.disk), self.__getSizeMap(job))
 		except Exception as e:
 			self.__clearExecutionQueueList()
 			printToConsole("execQueue exception:\n" + str(e))
 
+	def updateBandwidthLimit(self):
+		limit = config.plugins.MovieArchiver.bandwidthLimit.getValue()  # MB/s, 0 = unlimited
+		recordLimit = config.plugins.MovieArchiver.recordBandwidthLimit.getValue()
+		if recordLimit > 0 and self.isRecording():  # tighten the limit while recording
+			limit = min(limit, recordLimit) if limit > 0 else recordLimit
+		for fileTransfer in self.fileTransfers.values():
+			fileTransfer.idleIoPriority = config.plugins.MovieArchiver.idleIoPriority.getValue()
+		self.bandwidth.setRate(limit * 1024 * 1024)  # takes effect at the next chunk of the running transfers
+
+	def isRecording(self):
+		# getRecordings() is still empty while a timer is prepared, so the prepared and running timers count as well
+		if not NavigationInstance.instance:
+			return False
+		return bool(NavigationInstance.instance.getRecordings()) or any(not timer.justplay and timer.state in (timer.StatePrepared, timer.StateRunning) for timer in NavigationInstance.instance.RecordTimer.timer_list)
+
 	def isRecordingStartInNextTime(self):
 		recordings = len(NavigationInstance.instance.getRecordings())
 		nextRecordingTime = NavigationInstance.instance.RecordTimer.getNextRecordingTime()
 		return False if not recordings and (((nextRecordingTime - time()) > maglobals.SECONDS_NEXT_RECORD) or nextRecordingTime < 0) else True
 
 	def __clearExecutionQueueList(self):  # Private Methods
-		self.execCommand = ""
-		self.executionQueueList = deque()
-		self.executionQueueListInProgress = False
+		self.runningJobs = {}
+		for job in self.executionQueue:
+			if job.transferred > 0:
+				self.__removePartFiles(job)  # partial files of a paused or resumed transfer
+		self.executionQueue.clear()
+		self.journal.clear()
+		self.__queueEnded()
+		self.__saveFileIndexes()
+
+	def __queueEnded(self):
+		self.executionQueueInProgress = False
+		self.paused = False
+		for fileTransfer in self.fileTransfers.values():
+			fileTransfer.resume()
+		self.recordCheckTimer.stop()
+		self.removeEventListener(maglobals.RECORD_STARTED, self.__recordStarted)
+		self.removeEventListener(maglobals.RECORD_FINISHED, self.__recordFinished)
+
+	def __recordStarted(self):
+		if config.plugins.MovieArchiver.skipDuringRecords.getValue():
+			self.pauseQueue()
+		self.updateBandwidthLimit()
+
+	def __recordFinished(self, recordName=None):
+		self.__checkRecordings()
+
+	def __checkRecordings(self):
+		# polled while the queue runs, in case a record event was missed
+		recording = self.isRecording()
+		if recording and config.plugins.MovieArchiver.skipDuringRecords.getValue():
+			self.pauseQueue()
+		elif not recording:
+			self.resumeQueue()
+		self.updateBandwidthLimit()
+
+	def __saveFileIndexes(self):
+		if self.planBusy:  # saved by the scan itself, the indexes are not touched while the WorkerPool uses them
+			return
+		for fileIndex in self.fileIndexes.values():
+			fileIndex.save()
+			self.deduplicator.invalidate(fileIndex.rootPath)
+		self.fileIndexes = {}  # loaded again by the next run, not kept in memory between the runs
+		self.checksumCatalog.save()
+		self.archiveCatalog.save()
+		FingerprintCache.getInstance().save()
+
+	def __isDiskIdle(self, job):
+		# one writer per target disk, and a movie disk is read by MAX_READERS_PER_DISK transfers at most
+		if job.disk is None:
+			job.disk = MountCache.getInstance().getDisk(dirname(job.targetFile))
+			job.sourceDisk = MountCache.getInstance().getDisk(dirname(job.sourceFile))
+		readers = sum(1 for runningJob in self.runningJobs.values() if runningJob.sourceDisk == job.sourceDisk)
+		return job.disk not in self.runningJobs and readers < maglobals.MAX_READERS_PER_DISK
+
+	def __queueRestore(self, result, priority):
+		records, targetFolder = result
+		if records is None:
+			self.dispatchEvent(maglobals.INFO_MSG, targetFolder, 10)  # why it can't be restored
+			return
+		if exists(targetFolder) == False:
+			makedirs(targetFolder)
+		parts = [TransferJob(record.path, join(targetFolder, basename(record.path)), TransferJob.MODE_STREAM) for record in records]
+		bundle = BundleJob(parts, config.plugins.MovieArchiver.verifyTransfer.getValue(), priority)
+		bundle.size = sum(record.size for record in records)
+		movieSize = records[0].size
+		entry = self.archiveCatalog.get(records[0].path)
+		bitrate = movieSize / entry[ArchiveCatalog.ENTRY_DURATION] if entry is not None and entry[ArchiveCatalog.ENTRY_DURATION] > 0 else maglobals.RESTORE_DEFAULT_BITRATE
+		bundle.readyOffset = bundle.size - movieSize + min(movieSize, int(bitrate * maglobals.RESTORE_PREFETCH_SECONDS))  # the sidecar files are copied first
+		self.__addJobToQueue(bundle)
+		self.dispatchEvent(maglobals.INFO_MSG, _("Restore started."), 5)
+		self.execQueue()
+
+	def __transferState(self, job, state, offset):  # called by the worker thread
+		self.journal.update(job, state, offset)
+		self.journal.sync()
+		if job.isBundle() and job.readyOffset is not None and offset >= job.readyOffset:
+			job.readyOffset = None
+			self.dispatchEvent(maglobals.INFO_MSG, _("Restore: '%s' can be played now, the rest is still copied.") % basename(job.targetFile), 10)
+
+	def __getFileTransfer(self, disk):
+		if disk not in self.fileTransfers:
+			fileTransfer = FileTransfer(self.bandwidth)
+			fileTransfer.idleIoPriority = config.plugins.MovieArchiver.idleIoPriority.getValue()
+			fileTransfer.stateCallback = self.__transferState  # synced byte offsets and states go to the journal
+			self.fileTransfers[disk] = fileTransfer
+		return self.fileTransfers[disk]
+
+	def __getSizeMap(self, job):
+		# files of the archive disk of the job by size, None if dedupe is off or the index is in use or missing
+		if not config.plugins.MovieArchiver.dedupeArchive.getValue() or job.mode not in (TransferJob.MODE_COPY, TransferJob.MODE_MOVE) or self.planBusy:
+			return None
+		targetRoot = self.__getTargetRoot(job)
+		if targetRoot is None:
+			return None
+		targetIndex = self.getFileIndex(targetRoot)
+		return self.deduplicator.getSizeMap(targetIndex) if targetIndex.isValid() else None
+
+	def __getTargetRoot(self, job):
+		if job.relPath is not None:  # backup
+			return getTargetPathValue()
+		return next((path for path, limit in getArchiveTargets() if job.targetFile.startswith(join(path, ""))), None)
+
+	def __runJob(self, job, fileTransfer, sizeMap=None):  # runs in a worker thread
+		self.journal.sync()  # the jobs queued and finished on the reactor thread meanwhile, one fsync for all of them
+		recordingInfo = None
+		linkFinder = (lambda part: self.deduplicator.findDuplicate(part.sourceFile, sizeMap)) if sizeMap is not None else None  # content already on the archive disk is linked instead of copied
+		try:
+			if job.isBundle() and job.mode == TransferJob.MODE_MOVE:  # archived recording, read its meta files before the sources are gone
+				recordingInfo = self.archiveCatalog.getRecordingInfo([part.sourceFile for part in job.getParts()])
+			fileTransfer.transfer(job, linkFinder)
+			if job.relPath is not None:  # backup copy, fingerprint the target while the disk is awake
+				job.fingerprint = FingerprintCache.getInstance().getFingerprint(job.targetFile, cache=False)
+		except TransferCancelled:
+			job.error = "cancelled"
+		except TransferPaused:
+			pass  # job.paused is set
+		except Exception as e:
+			job.error = str(e)
+		reactor.callFromThread(self.__runFinished, job, recordingInfo)
 
-	def __runFinished(self, retval=None):
+	def __runFinished(self, job, recordingInfo=None):
 		try:
-			self.execCommand = ""
-			if len(self.executionQueueList) > 0:
-				self.execQueue()
+			self.stats.jobFinished(job)
+			running = self.runningJobs.get(job.disk) is job
+			if running:
+				del self.runningJobs[job.disk]
+			if job.paused:
+				if running:  # continues at the same byte offset after the record
+					printToConsole("runFinished: %s paused at %d bytes" % (job, job.transferred))
+					self.executionQueue.pushFront(job)
+					if not self.paused:  # queue was resumed before the transfer stopped
+						self.execQueue()
+				else:  # queue was stopped meanwhile
+					self.__removePartFiles(job)
+				return
+			self.journal.update(job, JobJournal.STATE_DONE)
+			if job.error is not None:
+				printToConsole("runFinished: %s failed: %s" % (job, job.error))
 			else:
-				printToConsole("Queue finished!")
-				self.executionQueueListInProgress = False
-				self.dispatchEvent(maglobals.QUEUE_FINISHED, True)
+				for part in job.getParts():
+					if part.checksum is not None:  # verified or linked transfer, remember the checksums for later backup comparisons
+						self.checksumCatalog.add(part.targetFile, part.checksum)
+						if part.mode == TransferJob.MODE_MOVE:
+							self.checksumCatalog.remove(part.sourceFile)
+						else:
+							self.checksumCatalog.add(part.sourceFile, part.checksum)
+					if job.mode != TransferJob.MODE_STREAM:  # a later transfer of the same content can be linked to it
+						self.deduplicator.addFile(self.__getTargetRoot(job), part.targetFile, part.size)
+				if job.mode == TransferJob.MODE_STREAM:
+					self.dispatchEvent(maglobals.INFO_MSG, _("Restore of '%s' finished.") % basename(job.targetFile), 5)
+				if recordingInfo is not None:
+					recordingInfo["service"] = self.getServiceName(recordingInfo["serviceRef"])  # eServiceCenter is only used on the main thread
+					recordingInfo["size"] = job.size
+					self.archiveCatalog.add(job.targetFile, recordingInfo)
+			if job.relPath is not None:  # stat the real target file, failed copies were removed
+				if self.planBusy:  # the WorkerPool uses the index
+					self.pendingIndexUpdates.append((job.relPath, job.fingerprint))
+				else:
+					self.getFileIndex(getTargetPathValue()).updateFile(job.relPath, job.fingerprint)
+			if not running:  # queue was stopped meanwhile
+				return
+			if len(self.executionQueue) > 0:
+				self.execQueue()
+			elif len(self.runningJobs) == 0 and not self.planning:  # otherwise finished by the scan
+				self.__queueFinished()
 		except Exception as e:
 			self.__clearExecutionQueueList()
 			printToConsole("runFinished exception:\n" + str(e))
 
-	def __addExecCommandToArchiveQueue(self, execCommandToAdd):
-		# add ExecCommand to executionQueueList if not in list
-		# if self.execCommand != execCommandToAdd and self.executionQueueList.count(execCommandToAdd) == 0:
-		if self.execCommand != execCommandToAdd and execCommandToAdd not in self.executionQueueList:
-			self.executionQueueList.append(quote(execCommandToAdd))
+	def __removePartFiles(self, job):
+		for part in job.getParts():
+			if part.mode != TransferJob.MODE_APPEND and exists(part.getWriteFile()):  # an append keeps the old copy, a stopped restore leaves nothing behind
+				unlink(part.getWriteFile())
+
+	def __startStatsTimer(self):
+		if not self.statsTimer.isActive():
+			self.statsTimer.start(maglobals.STATS_INTERVAL)
+
+	def __updateStats(self):
+		self.stats.sample(self.runningJobs, self.executionQueue)
+		if not self.running():  # last write of the run
+			self.stats.stopRun()
+			self.statsTimer.stop()
+		self.stats.save()
+
+	def __queueFinished(self):
+		printToConsole("Queue finished!")
+		self.__queueEnded()
+		self.__saveFileIndexes()
+		self.journal.compact()
+		self.dispatchEvent(maglobals.QUEUE_FINISHED, True)
+
+	def __runPlanning(self, function, args, callback):
+		# scan and plan in the WorkerPool, the callback runs on the reactor thread if the run was not stopped meanwhile
+		self.planning = True
+		self.planBusy = True
+		self.stats.startRun()
+		self.__startStatsTimer()
+		generation = self.planGeneration
+		WorkerPool.getInstance().submit(function, args, lambda result: self.__planningFinished(generation, callback, result), lambda error: self.__planningFinished(generation, None, error))
+
+	def __planningFinished(self, generation, callback, result):
+		self.planBusy = False
+		for relPath, fingerprint in self.pendingIndexUpdates:
+			self.getFileIndex(getTargetPathValue()).updateFile(relPath, fingerprint)
+		self.pendingIndexUpdates = []
+		if generation == self.planGeneration:
+			self.planning = False
+			if callback is not None:
+				callback(result)
+			else:
+				printToConsole("planning exception:\n" + str(result))
+				if not self.running():
+					self.dispatchEvent(maglobals.QUEUE_FINISHED, False)
+		if self.replanPriority is not None:
+			priority = self.replanPriority
+			self.replanPriority = None
+			self.startArchiving(priority)
+
+	def __queuePlan(self, plan, priority):
+		self.lastPlan = plan
+		printToConsole(self.lastPlan.getSummary())
+		if self.lastPlan.isEmpty():
+			if not self.running():
+				self.dispatchEvent(maglobals.QUEUE_FINISHED, False)
+			return
+		for item in self.lastPlan.items:  # movies of the running job or already queued are skipped
+			self.addMovieToArchiveQueue(item.movie.path, item.records, item.target, priority, item.sourcePath)
+		self.dispatchEvent(maglobals.INFO_MSG, _("Start archiving."), 5)
+		self.execQueue()
+
+	def __queueBackupBatch(self, sourceFiles, priority, generation):
+		if generation == self.planGeneration:  # not stopped meanwhile
+			for sourceFile, mode, offset, size in sourceFiles:
+				self.addFileToBackupQueue(sourceFile, priority, mode, offset, size)
+			self.execQueue()
+
+	def __queueBackupFiles(self, sourceFiles, priority):
+		if sourceFiles is None:  # no files found
+			return
+		for sourceFile, mode, offset, size in sourceFiles:
+			self.addFileToBackupQueue(sourceFile, priority, mode, offset, size)
+		if len(self.executionQueue) > 0:
+			self.execQueue()
+		elif self.executionQueueInProgress and len(self.runningJobs) == 0:  # all batches were copied during the scan
+			self.__queueFinished()
+		elif not self.running():
+			self.dispatchEvent(maglobals.QUEUE_FINISHED, False)
+
+	def __addJobToQueue(self, jobToAdd):
+		# add job to the executionQueue if the source file is not running or queued already
+		if any(job.getKey() == jobToAdd.getKey() for job in self.runningJobs.values()):
+			return
+		if self.executionQueue.add(jobToAdd):
+			self.journal.add(jobToAdd)
 
 
 class ExcludeDirsView(MAhelper, Screen):
@@ -450,12 +1039,13 @@ class ExcludeDirsView(MAhelper, Screen):
 			<eLabel position="320,360" size="5,40" backgroundColor="#e5dd00" />
 		</screen>"""
 
-	def __init__(self, session):
+	def __init__(self, session, dirsConfig=None):
 		Screen.__init__(self, session)
 		self["key_red"] = StaticText(_("Cancel"))
 		self["key_green"] = StaticText(_("Save"))
 		self["key_yellow"] = StaticText()
-		self.excludedDirs = config.plugins.MovieArchiver.excludeDirs.getValue()
+		self.dirsConfig = dirsConfig or config.plugins.MovieArchiver.excludeDirs  # also used to select the keep local folders
+		self.excludedDirs = self.dirsConfig.getValue()
 		self.dirList = MultiFileSelectList(self.excludedDirs, getSourcePathValue(), showFiles=False)
 		self["excludeDirList"] = self.dirList
 		self["actions"] = ActionMap(["DirectionActions", "OkCancelActions", "ShortcutActions"],
@@ -481,7 +1071,7 @@ class ExcludeDirsView(MAhelper, Screen):
 		self.selectionChanged()
 
 	def setWindowTitle(self):
-		self.setTitle(_("Select Exclude Dirs"))
+		self.setTitle(_("Select Exclude Dirs") if self.dirsConfig is config.plugins.MovieArchiver.excludeDirs else _("Select Keep Local Dirs"))
 
 	def selectionChanged(self):
 		current = self["excludeDirList"].getCurrent()[0]
@@ -506,8 +1096,8 @@ class ExcludeDirsView(MAhelper, Screen):
 	def saveSelection(self):
 		self.excludedDirs = self["excludeDirList"].getSelectedList()
 		self.excludedDirs = self.removeSymbolicLinks(self.excludedDirs)
-		config.plugins.MovieArchiver.excludeDirs.setValue(self.excludedDirs)
-		config.plugins.MovieArchiver.excludeDirs.save()
+		self.dirsConfig.setValue(self.excludedDirs)
+		self.dirsConfig.save()
 		config.plugins.MovieArchiver.save()
 		config.save()
 		self.close(None)
@@ -520,6 +1110,96 @@ class ExcludeDirsView(MAhelper, Screen):
 			self.dirList.descent()
 
 
+class ArchiveCatalogView(MAhelper, Screen):
+	skin = """
+		<screen name="ArchiveCatalogView" position="center,center" size="900,500" resolution="1280,720" title="MovieArchiver Catalog">
+			<widget name="catalogList" position="5,5" size="890,340" transparent="1" scrollbarMode="showOnDemand" />
+			<widget source="info" render="Label" font="Regular;18" position="10,350" size="880,100" />
+			<widget source="key_red" render="Label" font="Regular; 20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="20,465" size="250,33" transparent="1" />
+			<widget source="key_green" render="Label" font="Regular; 20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="185,465" size="250,33" transparent="1" />
+			<widget source="key_yellow" render="Label" font="Regular; 20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="335,465" size="250,33" transparent="1" />
+			<widget source="key_blue" render="Label" font="Regular; 20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="485,465" size="250,33" transparent="1" />
+			<eLabel position="5,460" size="5,40" backgroundColor="#e61700" />
+			<eLabel position="170,460" size="5,40" backgroundColor="#61e500" />
+			<eLabel position="320,460" size="5,40" backgroundColor="#e5dd00" />
+			<eLabel position="470,460" size="5,40" backgroundColor="#0000e6" />
+		</screen>"""
+
+	def __init__(self, session):
+		Screen.__init__(self, session)
+		self["key_red"] = StaticText(_("Close"))
+		self["key_green"] = StaticText(_("Play"))
+		self["key_yellow"] = StaticText(_("Search"))
+		self["key_blue"] = StaticText(_("Restore"))
+		self["info"] = StaticText()
+		self["catalogList"] = MenuList([])
+		self.catalog = NotificationController.getInstance().getCatalog()  # listed from the flash, the archive disk keeps sleeping
+		self.searchText = None
+		self["actions"] = ActionMap(["OkCancelActions", "ColorActions"],
+		{
+			"cancel": self.close,
+			"red": self.close,
+			"ok": self.play,
+			"green": self.play,
+			"yellow": self.search,
+			"blue": self.restore
+		}, -1)
+		self["catalogList"].onSelectionChanged.append(self.selectionChanged)
+		self.onLayoutFinish.append(self.layoutFinished)
+
+	def layoutFinished(self):
+		self.setTitle(_("MovieArchiver Catalog"))
+		self.fillList()
+
+	def fillList(self):
+		menuList = []
+		for moviePath, entry in self.catalog.getEntries(self.searchText):
+			begin = strftime("%d.%m.%Y %H:%M", localtime(entry[ArchiveCatalog.ENTRY_BEGIN])) if entry[ArchiveCatalog.ENTRY_BEGIN] else ""
+			menuList.append(("%s  %s  %s" % (begin, entry[ArchiveCatalog.ENTRY_SERVICE], entry[ArchiveCatalog.ENTRY_TITLE]), moviePath))
+		self["catalogList"].setList(menuList)
+		self.selectionChanged()
+
+	def selectionChanged(self):
+		current = self["catalogList"].getCurrent()
+		if current is None:
+			self["info"].setText(_("No archived movies found.") if not self.searchText else _("No archived movies found for '%s'.") % self.searchText)
+			return
+		entry = self.catalog.get(current[1])
+		self["info"].setText("%s\n%s\n%d min, %s" % (entry[ArchiveCatalog.ENTRY_DESCRIPTION], current[1], entry[ArchiveCatalog.ENTRY_DURATION] // 60, self.formatSize(entry[ArchiveCatalog.ENTRY_SIZE])))
+
+	def play(self):
+		current = self["catalogList"].getCurrent()
+		if current is None:
+			return
+		if not exists(current[1]):  # the only access to the archive disk
+			self.catalog.remove(current[1])
+			self.catalog.save()
+			self.session.open(MessageBox, _("The movie was removed from the archive."), MessageBox.TYPE_INFO, 5)
+			self.fillList()
+			return
+		self.session.open(MoviePlayer, eServiceReference(1, 0, current[1]))
+
+	def restore(self):
+		current = self["catalogList"].getCurrent()
+		if current is not None:
+			self.session.openWithCallback(lambda answer: self.restoreConfirmed(answer, current[1]), MessageBox, _("Restore '%s' to the movie folder?") % current[0], MessageBox.TYPE_YESNO)
+
+	def restoreConfirmed(self, answer, moviePath):
+		if answer:
+			NotificationController.getInstance().restoreMovie(moviePath)
+
+	def search(self):
+		self.session.openWithCallback(self.searchEntered, VirtualKeyBoard, title=_("Search archived movies"), text=self.searchText or "")
+
+	def searchEntered(self, text):
+		if text is not None:
+			self.searchText = text.strip() or None
+			self.fillList()
+
+	def formatSize(self, size):
+		return "%.1f GB" % (size / 1024.0 ** 3) if size >= 1024 ** 3 else "%d MB" % (size // 1024 ** 2)
+
+
 class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 	skin = """
 		<screen name="MovieArchiver-Setup" position="center,center" size="1000,500" resolution="1280,720" flags="wfNoBorder" backgroundColor="#90000000">
@@ -528,8 +1208,11 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 			<eLabel font="Regular;20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="235,465" size="250,33" text="Save" transparent="1" />
 			<widget source="archiveButton" render="Label" font="Regular;20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="432,465" size="250,33" transparent="1" />
 			<widget name="config" position="21,74" size="590,360" font="Regular;20" scrollbarMode="showOnDemand" transparent="1" />
+			<widget source="stats" render="Label" font="Regular;18" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="21,434" size="590,26" transparent="1" />
 			<eLabel name="new eLabel" position="640,0" zPosition="-2" size="360,500" backgroundColor="#20000000" transparent="0" />
-			<widget source="help" render="Label" position="660,74" size="320,460" font="Regular;20" />
+			<widget source="help" render="Label" position="660,74" size="320,380" font="Regular;20" />
+			<eLabel font="Regular;20" foregroundColor="unffffff" backgroundColor="#20000000" halign="left" position="677,465" size="300,33" text="Catalog / Restore" transparent="1" />
+			<eLabel position="660,460" size="5,40" backgroundColor="#0000e6" />
 			<eLabel position="660,15" size="360,50" text="Help" font="Regular;40" valign="center" transparent="1" backgroundColor="#20000000" />
 			<eLabel position="20,15" size="348,50" text="MovieArchiver" font="Regular;40" valign="center" transparent="1" backgroundColor="#20000000" />
 			<eLabel position="303,18" size="349,50" text="Setup" foregroundColor="unffffff" font="Regular;30" valign="center" backgroundColor="#20000000" transparent="1" halign="left" />
@@ -541,12 +1224,17 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 
 	def __init__(self, session, args=None):
 		Screen.__init__(self, session)
-		getSourcePath().addNotifier(self.checkReadWriteDir, initial_call=False, immediate_feedback=False)
-		getTargetPath().addNotifier(self.checkReadWriteDir, initial_call=False, immediate_feedback=False)
+		for sourcePath in self.getAllSourcePaths():
+			sourcePath.addNotifier(self.checkReadWriteDir, initial_call=False, immediate_feedback=False)
+		for targetPath in self.getAllTargetPaths():
+			targetPath.addNotifier(self.checkReadWriteDir, initial_call=False, immediate_feedback=False)
 		self.onChangedEntry = []
 		ConfigListScreen.__init__(self, self.getMenuItemList(), session=session, on_change=self.__changedEntry)
 		self["help"] = StaticText()
 		self["archiveButton"] = StaticText()
+		self["stats"] = StaticText()
+		self.statsTimer = eTimer()
+		self.statsTimer.callback.append(self.__updateStats)
 		self.NOTIFICATIONCONTROLLER = NotificationController.getInstance()
 		self.NOTIFICATIONCONTROLLER.setView(self)
 		self["actions"] = ActionMap(["SetupActions",
@@ -554,7 +1242,8 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 									"ColorActions"], {"cancel": self.cancel,
 														"save": self.save,
 														"ok": self.ok,
-														"yellow": self.yellow
+														"yellow": self.yellow,
+														"blue": self.blue
 													}, -2)
 		self.onLayoutFinish.append(self.onLayoutFinished)
 
@@ -568,24 +1257,57 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 		self.__updateArchiveNowButtonText()
 		if self.NOTIFICATIONCONTROLLER.isArchiving() == True:
 			self.addEventListener(maglobals.QUEUE_FINISHED, self.__archiveFinished)
+		self.__updateStats()
+		self.statsTimer.start(1000)  # the rates are sampled by the MovieManager, this only shows them
 		self.onClose.append(self.__onClose)
 
 	def getMenuItemList(self):
 		menuList = []
 		menuList.append(getConfigListEntry(_("Archive automatically"), config.plugins.MovieArchiver.enabled, _("If yes, the MovieArchiver automatically moved or copied (if 'Backup Movies' is on) movies to archive folder if limit is reached")))
-		menuList.append(getConfigListEntry(_("Backup Movies instead of Archive"), config.plugins.MovieArchiver.backup, _("If yes, the movies will only be copy to the archive movie folder and not moved.\n\nCurrently for synchronize, it comparing only fileName and fileSize."), 'BACKUP'))
-		menuList.append(getConfigListEntry(_("Skip archiving during records"), config.plugins.MovieArchiver.skipDuringRecords, _("If a record is in progress or start in the next minutes after a record, the archiver skipped till the next record")))
+		menuList.append(getConfigListEntry(_("Backup Movies instead of Archive"), config.plugins.MovieArchiver.backup, _("If yes, the movies will only be copy to the archive movie folder and not moved.\n\nFor synchronize, files are compared by fileName, fileSize and a fingerprint of their content."), 'BACKUP'))
+		menuList.append(getConfigListEntry(_("Skip archiving during records"), config.plugins.MovieArchiver.skipDuringRecords, _("If a record is in progress or start in the next minutes after a record, the archiver skipped till the next record.\nA running archiving is paused while recording and continues after the record")))
+		menuList.append(getConfigListEntry(_("Collect records before archiving"), config.plugins.MovieArchiver.batchSpinup, _("If yes, finished records are collected and the archive harddisk is only woken up when enough data is pending or the oldest record waits too long. All collected records are then archived in one run.\nArchive now always starts at once."), 'BATCH'))
+		if config.plugins.MovieArchiver.batchSpinup.getValue():
+			menuList.append(getConfigListEntry(_("Collected records (in GB)"), config.plugins.MovieArchiver.batchSize, _("The archive harddisk is woken up when the finished records reach this size.\nThe movie folder limit should leave room for it, a movie folder with less free diskspace is archived at once.")))
+			menuList.append(getConfigListEntry(_("Maximum waiting time (in hours)"), config.plugins.MovieArchiver.batchMaxAge, _("A finished record is archived at the latest after this time.")))
+		menuList.append(getConfigListEntry(_("Verify copied files"), config.plugins.MovieArchiver.verifyTransfer, _("If yes, a checksum is calculated while copying and compared with the written file before the source file is deleted.\n\nThe checksums are also used to compare files during backup.")))
+		menuList.append(getConfigListEntry(_("Store identical files once"), config.plugins.MovieArchiver.dedupeArchive, _("If yes, recordings with the same content on the archive harddisk are replaced by hardlinks and a movie which is already archived is linked instead of copied.\n\nThe archive harddisk must support hardlinks (not FAT/exFAT).")))
+		menuList.append(getConfigListEntry(_("Bandwidth limit (in MB/s)"), config.plugins.MovieArchiver.bandwidthLimit, _("Maximum transfer speed in MB/s. 0 is unlimited.")))
+		menuList.append(getConfigListEntry(_("Bandwidth limit during records (in MB/s)"), config.plugins.MovieArchiver.recordBandwidthLimit, _("Maximum transfer speed in MB/s while a record is running. 0 uses the normal bandwidth limit.")))
+		menuList.append(getConfigListEntry(_("Low I/O priority"), config.plugins.MovieArchiver.idleIoPriority, _("If yes, the transfers only use the hard disk if no one else needs it, so records and playback are not disturbed.")))
 		menuList.append(getConfigListEntry(_("Show notification if archive limit reached"), config.plugins.MovieArchiver.showLimitReachedNotification, _("Show notification window message if 'Archive Movie Folder Limit' is reached")))
 		menuList.append(getConfigListEntry(_("-------------------------------------------------------------"), ))
 		menuList.append(getConfigListEntry(_("Movie Folder"), getSourcePath(), _("Source folder / HDD\n\nPress 'Ok' to open path selection view")))
 		menuList.append(getConfigListEntry(_("Movie Folder Limit (in GB)"), config.plugins.MovieArchiver.sourceLimit, _("Movie Folder free diskspace limit in GB. If free diskspace reach under this limit, the MovieArchiver will move old records to the archive")))
-		if config.plugins.MovieArchiver.backup.getValue() == True:
-			menuList.append(getConfigListEntry(_("Exclude folders"), config.plugins.MovieArchiver.excludeDirs, _("Selected Directories wont be backuped.")))
+		if config.plugins.MovieArchiver.backup.getValue() == False:
+			menuList.append(getConfigListEntry(_("Additional Movie Folders"), config.plugins.MovieArchiver.additionalSourceCount, _("Number of additional movie folders / HDDs. The oldest movies of all movie folders are archived first.\nFolders on the same HDD share the free diskspace, the highest limit of them is used."), 'SOURCES'))
+			for i, additionalSource in enumerate(config.plugins.MovieArchiver.additionalSources[:config.plugins.MovieArchiver.additionalSourceCount.getValue()]):
+				menuList.append(getConfigListEntry(_("Movie Folder %d") % (i + 2), additionalSource.path, _("Additional source folder / HDD\n\nPress 'Ok' to open path selection view")))
+				menuList.append(getConfigListEntry(_("Movie Folder %d Limit (in GB)") % (i + 2), additionalSource.limit, _("Free diskspace limit in GB of this movie folder. If free diskspace reach under this limit, the MovieArchiver will move old records to the archive")))
+		if config.plugins.MovieArchiver.backup.getValue() == False:
+			menuList.append(getConfigListEntry(_("Movies to archive"), config.plugins.MovieArchiver.planStrategy, _("'oldest movies first' moves the oldest movies until the limit is reached again.\n'fewest bytes over the limit' chooses the movies which free the needed space with as few bytes as possible.\n'coldest movies first' moves watched movies and movies not played for a long time first, movies you are watching stay on the HDD."), 'STRATEGY'))
+			if config.plugins.MovieArchiver.planStrategy.getValue() == ArchivePlan.STRATEGY_COLDEST:
+				menuList.append(getConfigListEntry(_("Keep folders local"), config.plugins.MovieArchiver.keepLocalDirs, _("Movies in the selected folders are archived last.\n\nPress 'Ok' to select the folders")))
+		if config.plugins.MovieArchiver.backup.getValue() == False:
+			menuList.append(getConfigListEntry(_("Archive sub folders"), config.plugins.MovieArchiver.archiveRecursive, _("If yes, the oldest movies of the movie folder and all sub folders are archived. The sub folders are created in the archive folder."), 'RECURSIVE'))
+		if config.plugins.MovieArchiver.backup.getValue() == True or config.plugins.MovieArchiver.archiveRecursive.getValue() == True:
+			menuList.append(getConfigListEntry(_("Exclude folders"), config.plugins.MovieArchiver.excludeDirs, _("Selected Directories wont be backuped or archived.")))
 		menuList.append(getConfigListEntry(_("-------------------------------------------------------------"), ))
 		menuList.append(getConfigListEntry(_("Archive Folder"), getTargetPath(), _("Target folder / HDD where the movies will moved or backuped.\n\nPress 'Ok' to open path selection view")))
 		menuList.append(getConfigListEntry(_("Archive Folder Limit (in GB)"), config.plugins.MovieArchiver.targetLimit, _("If limit is reach, no movies will anymore moved to the archive")))
+		if config.plugins.MovieArchiver.backup.getValue() == False:
+			menuList.append(getConfigListEntry(_("Additional Archive Folders"), config.plugins.MovieArchiver.additionalTargetCount, _("Number of additional archive folders / HDDs. Every movie is moved to the archive folder with the most free space above its limit.\nMovies to different HDDs are moved at the same time."), 'TARGETS'))
+			for i, additionalTarget in enumerate(config.plugins.MovieArchiver.additionalTargets[:config.plugins.MovieArchiver.additionalTargetCount.getValue()]):
+				menuList.append(getConfigListEntry(_("Archive Folder %d") % (i + 2), additionalTarget.path, _("Additional target folder / HDD where the movies will moved.\n\nPress 'Ok' to open path selection view")))
+				menuList.append(getConfigListEntry(_("Archive Folder %d Limit (in GB)") % (i + 2), additionalTarget.limit, _("If limit is reach, no movies will anymore moved to this archive folder")))
 		return menuList
 
+	def getAllSourcePaths(self):
+		return [getSourcePath()] + [additionalSource.path for additionalSource in config.plugins.MovieArchiver.additionalSources]
+
+	def getAllTargetPaths(self):
+		return [getTargetPath()] + [additionalTarget.path for additionalTarget in config.plugins.MovieArchiver.additionalTargets]
+
 	def checkReadWriteDir(self, configElement):  # callback for path-browser
 		if self.pathIsWriteable(configElement.getValue()):
 			configElement.lastValue = configElement.getValue()
@@ -603,17 +1325,23 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 			self.NOTIFICATIONCONTROLLER.startArchiving(True)
 		self.__updateArchiveNowButtonText()
 
+	def blue(self):
+		self.session.open(ArchiveCatalogView)
+
 	def excludedDirsChoosen(self, ret):
 		config.plugins.MovieArchiver.excludeDirs.save()
+		config.plugins.MovieArchiver.keepLocalDirs.save()
 		config.plugins.MovieArchiver.save()
 		# config.save()
 
 	def ok(self):
 		cur = self.getCurrent()
-		if cur == getSourcePath() or cur == getTargetPath():
+		if cur in getSourcePaths() or cur in getTargetPaths():
 			self.chooseDestination()
 		elif cur == config.plugins.MovieArchiver.excludeDirs:
 			self.session.openWithCallback(self.excludedDirsChoosen, ExcludeDirsView)
+		elif cur == config.plugins.MovieArchiver.keepLocalDirs:
+			self.session.openWithCallback(self.excludedDirsChoosen, ExcludeDirsView, config.plugins.MovieArchiver.keepLocalDirs)
 		else:
 			ConfigListScreen.keyOK(self)
 
@@ -646,8 +1374,10 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 		self.close()
 
 	def clean(self):
-		getSourcePath().clearNotifiers()
-		getTargetPath().clearNotifiers()
+		for sourcePath in self.getAllSourcePaths():
+			sourcePath.clearNotifiers()
+		for targetPath in self.getAllTargetPaths():
+			targetPath.clearNotifiers()
 
 	def getCurrent(self):
 		cur = self["config"].getCurrent()
@@ -660,7 +1390,7 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 			pathInput.setValue(res)
 
 	def chooseDestination(self):
-		self.session.openWithCallback(self.pathSelected, MovieLocationBox, _("Choose folder"), self.getCurrent().getValue(), minFree=100)
+		self.session.openWithCallback(self.pathSelected, MovieLocationBox, _("Choose folder"), self.getCurrent().getValue() or getTargetPathValue(), minFree=100)
 
 	def __updateArchiveNowButtonText(self):  # Private Methods
 		if self.NOTIFICATIONCONTROLLER.isArchiving() == True:
@@ -672,6 +1402,15 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 	def __archiveFinished(self):
 		self.__updateArchiveNowButtonText()
 
+	def __updateStats(self):
+		text = ""
+		if self.NOTIFICATIONCONTROLLER.isArchiving():
+			text = self.NOTIFICATIONCONTROLLER.getStats().getText()
+			transferred, size = self.NOTIFICATIONCONTROLLER.getProgress()
+			if size > 0:  # the running transfers
+				text += _("  Current: %d%%") % (transferred * 100 // size)
+		self["stats"].setText(text)
+
 	def __updateHelp(self):
 		cur = self["config"].getCurrent()
 		if cur:
@@ -680,10 +1419,11 @@ class MovieArchiverView(MAhelper, ConfigListScreen, Screen):
 	def __changedEntry(self):
 		cur = self["config"].getCurrent()
 		cur = cur and len(cur) > 3 and cur[3]
-		if cur == "BACKUP":  # change if type is BACKUP
+		if cur in ("BACKUP", "RECURSIVE", "SOURCES", "TARGETS", "STRATEGY", "BATCH"):  # change if type is BACKUP, RECURSIVE, SOURCES, TARGETS, STRATEGY or BATCH
 			self["config"].setList(self.getMenuItemList())
 
 	def __onClose(self):
+		self.statsTimer.stop()
 		self.NOTIFICATIONCONTROLLER.setView(None)
 
 
@@ -693,6 +1433,7 @@ def autostart(reason, **kwargs):  # Autostart
 		try:
 			NOTIFICATIONCONTROLLER = NotificationController.getInstance()
 			NOTIFICATIONCONTROLLER.start()
+			NOTIFICATIONCONTROLLER.resumeJobs()  # continue jobs which were interrupted by a restart
 		except Exception as e:
 			printToConsole("Autostart exception " + str(e))
 			exc_type, exc_value, exc_traceback = exc_info()
@@ -701,15 +1442,22 @@ def autostart(reason, **kwargs):  # Autostart
 		if maglobals.NOTIFICATIONCONTROLLER is not None:  # Stop NotificationController
 			maglobals.NOTIFICATIONCONTROLLER.stop()
 			NOTIFICATIONCONTROLLER = None
+		if WorkerPool.instance is not None:
+			WorkerPool.instance.shutdown()
 
 
 def main(session, **kwargs):
 	session.open(MovieArchiverView)
 
 
+def catalog(session, **kwargs):
+	session.open(ArchiveCatalogView)
+
+
 def Plugins(**kwargs):
 	pluginList = [
 				PluginDescriptor(where=PluginDescriptor.WHERE_AUTOSTART, fnc=autostart, needsRestart=False),
-				PluginDescriptor(name="MovieArchiver", description=_("Archive or backup your movies"), where=PluginDescriptor.WHERE_PLUGINMENU, icon="plugin.png", fnc=main, needsRestart=False)
+				PluginDescriptor(name="MovieArchiver", description=_("Archive or backup your movies"), where=PluginDescriptor.WHERE_PLUGINMENU, icon="plugin.png", fnc=main, needsRestart=False),
+				PluginDescriptor(name="MovieArchiver Catalog", description=_("Browse the archived movies"), where=PluginDescriptor.WHERE_PLUGINMENU, icon="plugin.png", fnc=catalog, needsRestart=False)
 				]
 	return pluginList